@@ -2,11 +2,20 @@ import pandas as pd
 import numpy as np
 import math
 import config
+from profiling import timed
 
 def monthly_rebalance_dates(index, freq='M'):
     return pd.date_range(index.min(), index.max(), freq=freq).intersection(index)
 
+@timed('backtest')
 def run_backtest(prices: pd.DataFrame, score: pd.DataFrame, top_n: int) -> dict:
+    if config.BACKTEST_ENGINE == 'numpy':
+        return run_backtest_numpy(prices, score, top_n)
+    if config.BACKTEST_ENGINE == 'pandas':
+        return run_backtest_pandas(prices, score, top_n)
+    raise ValueError(f'Unknown BACKTEST_ENGINE: {config.BACKTEST_ENGINE!r}')
+
+def run_backtest_pandas(prices: pd.DataFrame, score: pd.DataFrame, top_n: int) -> dict:
     dates = prices.index
     rebalance_dates = monthly_rebalance_dates(dates, config.REB_FREQ)
 
@@ -85,4 +94,280 @@ def run_backtest(prices: pd.DataFrame, score: pd.DataFrame, top_n: int) -> dict:
         if not np.isnan(p):
             close_position(last_dt, tkr, p, 'FINAL')
 
-    return {'pv': pv.dropna(), 'trades': pd.DataFrame(trades)}
\ No newline at end of file
+    return {'pv': pv.dropna(), 'trades': pd.DataFrame(trades)}
+
+def pick_matrix(scores: np.ndarray, top_n: int) -> np.ndarray:
+    """Top-N column indices per row of `scores` (last axis = tickers), best first.
+
+    Uses argpartition rather than a full sort. Ties are broken by column
+    order, as a stable descending sort would, including ties at the cutoff.
+    NaN scores are never picked; short rows are padded with -1.
+    """
+    scores = np.asarray(scores, dtype=float)
+    lead, n = scores.shape[:-1], scores.shape[-1]
+    k = min(top_n, n)
+    key = np.where(np.isnan(scores), np.inf, -scores).reshape(-1, n)
+    if k == 0:
+        return np.full(lead + (top_n,), -1, dtype=np.intp)
+    kth = np.take_along_axis(key, np.argpartition(key, k - 1, axis=1)[:, k - 1:k], axis=1)
+    below = key < kth
+    tied = key == kth
+    take = below | (tied & (np.cumsum(tied, axis=1) <= k - below.sum(axis=1, keepdims=True)))
+    cols = np.nonzero(take)[1].reshape(-1, k)
+    order = np.argsort(np.take_along_axis(key, cols, axis=1), axis=1, kind='stable')
+    picks = np.take_along_axis(cols, order, axis=1)
+    picks[np.isinf(np.take_along_axis(key, picks, axis=1))] = -1
+    if k < top_n:
+        picks = np.concatenate([picks, np.full((len(picks), top_n - k), -1, dtype=picks.dtype)], axis=1)
+    return picks.reshape(lead + (top_n,))
+
+def _mark(cash, shares, p):
+    # cash + sum(shares * p) over the book in holding order, skipping NaN
+    # quotes; np.cumsum is sequential, like the dict engine's running sum
+    held = shares * p
+    held[np.isnan(held)] = 0.0
+    return cash + (np.cumsum(held, axis=-1)[..., -1] if held.shape[-1] else 0.0)
+
+def _hold(px, lo, hi, book, shares, entry, peak, cash, sell_net, trades):
+    # Rows lo..hi with a fixed book: find each holding's first stop hit in one
+    # pass (cumulative max of prices since entry against both thresholds),
+    # apply the exits in (date, holding order) and mark to market every row.
+    # Returns the PV rows, cash and the surviving book.
+    if not book.size:
+        return np.full(hi - lo + 1, cash + 0.0), cash, book
+    p = px[lo:hi + 1, book]
+    live = ~np.isnan(p)
+    run_peak = np.fmax.accumulate(np.vstack([peak[book], p]), axis=0)[1:]
+    en = entry[book]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dd_from_peak = np.where(run_peak > 0, (run_peak - p) / run_peak, 0.0)
+        loss_from_entry = np.where(en > 0, (en - p) / en, 0.0)
+    trail = live & (dd_from_peak >= config.TRAILING_STOP)
+    hit = trail | (live & (loss_from_entry >= config.FIXED_STOP_LOSS))
+
+    n_rows = len(p)
+    exit_row = np.where(hit.any(axis=0), hit.argmax(axis=0), n_rows)
+    exited = np.flatnonzero(exit_row < n_rows)
+    exited = exited[np.lexsort((exited, exit_row[exited]))]
+    cash_steps = [cash]
+    for k in exited:
+        s, j = exit_row[k], book[k]
+        cash += shares[j] * p[s, k] * sell_net
+        cash_steps.append(cash)
+        trades.append((lo + s, j, 'SELL', p[s, k], int(shares[j]), 'TRAIL_STOP' if trail[s, k] else 'STOP_LOSS'))
+
+    rows = np.arange(n_rows)
+    cash_rows = np.asarray(cash_steps)[np.searchsorted(exit_row[exited], rows, side='right')]
+    open_rows = rows[:, None] < exit_row[None, :]
+    pv = _mark(cash_rows, np.where(open_rows, shares[book], 0), p)
+
+    peak[book] = run_peak[-1]
+    return pv, cash, book[exit_row >= n_rows]
+
+def simulate(px: np.ndarray, picks: np.ndarray, reb_rows: np.ndarray):
+    # Array twin of run_backtest_pandas, driven by a pick matrix (one row of
+    # pick_matrix output per entry of reb_rows). State lives in per-ticker
+    # arrays and `book` keeps the held columns in the order the dict engine
+    # would iterate them, so trades come out in the same sequence and cash/PV
+    # sums are accumulated in the same order. Instead of walking every day the
+    # engine jumps between events: each holding period up to the next
+    # rebalance is handled by _hold in one array pass, then the rebalance
+    # itself, then final liquidation.
+    n_dates, n_tkrs = px.shape
+    buy_cost = 1 + config.SLIPPAGE_BPS/10000.0
+    sell_net = 1 - config.SLIPPAGE_BPS/10000.0
+
+    shares = np.zeros(n_tkrs, dtype=np.int64)
+    entry = np.zeros(n_tkrs)
+    peak = np.zeros(n_tkrs)
+    book = np.empty(0, dtype=np.intp)
+    pv = np.empty(n_dates)
+    cash = config.INITIAL_CASH
+    trades = []
+
+    done = -1
+    for r, i in enumerate(reb_rows):
+        i = int(i)
+        # Stops and mark-to-market up to and including the rebalance day
+        pv[done + 1:i + 1], cash, book = _hold(px, done + 1, i, book, shares, entry, peak, cash, sell_net, trades)
+        done = i
+
+        # Rebalance
+        p_row = px[i]
+        chosen = picks[r][picks[r] >= 0]
+
+        p = p_row[book]
+        drop = ~np.isin(book, chosen) & ~np.isnan(p)
+        for k in np.flatnonzero(drop):
+            j = book[k]
+            cash += shares[j] * p[k] * sell_net
+            trades.append((i, j, 'SELL', p[k], int(shares[j]), 'REBAL_DROP'))
+        book = book[~drop]
+
+        new_names = chosen[~np.isin(chosen, book)]
+        alloc = cash / len(new_names) if len(new_names) else 0.0
+        added = []
+        for j in new_names:
+            p = p_row[j]
+            if np.isnan(p) or p <= 0:
+                continue
+            n = math.floor(alloc / (p * buy_cost))
+            if n <= 0:
+                continue
+            cash -= n * p * buy_cost
+            shares[j] = n
+            entry[j] = p
+            peak[j] = p
+            added.append(j)
+            trades.append((i, j, 'BUY', p, n, 'REBAL_ADD'))
+        if added:
+            book = np.concatenate([book, np.asarray(added, dtype=np.intp)])
+
+        # Mark-to-market after the rebalance
+        pv[i] = _mark(cash, shares[book], p_row[book])
+
+    if done < n_dates - 1:
+        pv[done + 1:], cash, book = _hold(px, done + 1, n_dates - 1, book, shares, entry, peak, cash, sell_net, trades)
+
+    # Liquidate at end
+    last = n_dates - 1
+    for j in book:
+        p = px[last, j]
+        if not np.isnan(p):
+            cash += shares[j] * p * sell_net
+            trades.append((last, j, 'SELL', p, int(shares[j]), 'FINAL'))
+
+    return pv, trades
+
+def run_backtest_numpy(prices: pd.DataFrame, score: pd.DataFrame, top_n: int) -> dict:
+    # only the rebalance rows of `score` are read, so a score panel holding
+    # just those dates (e.g. from a rebalance-only ZScoreTensor) is enough
+    reb_rows = rebalance_rows(prices.index)
+    sc = score.reindex(index=prices.index[reb_rows], columns=prices.columns).to_numpy(dtype=float)
+    return run_backtest_picks(prices, pick_matrix(sc, top_n))
+
+def run_backtest_picks(prices: pd.DataFrame, picks: np.ndarray) -> dict:
+    dates = prices.index
+    pv, raw = simulate(prices.to_numpy(dtype=float), picks, rebalance_rows(dates))
+
+    cols = prices.columns
+    trades = [{'date': dates[i], 'ticker': cols[j], 'side': side, 'price': price, 'shares': n, 'reason': why}
+              for i, j, side, price, n, why in raw]
+    return {'pv': pd.Series(pv, index=dates).dropna(), 'trades': pd.DataFrame(trades)}
+
+def rebalance_rows(index, freq=None) -> np.ndarray:
+    return np.flatnonzero(index.isin(monthly_rebalance_dates(index, freq or config.REB_FREQ)))
+
+def _ordered_sum(start, values, order):
+    # start + values[:, order[0]] + values[:, order[1]] + ... added one at a
+    # time per row (np.cumsum is sequential), i.e. in the given column order
+    vals = np.take_along_axis(values, order, axis=1)
+    return np.cumsum(np.concatenate([start[:, None], vals], axis=1), axis=1)[:, -1]
+
+def simulate_batch(px: np.ndarray, picks: np.ndarray, reb_rows: np.ndarray,
+                   trailing_stop=None, stop_loss=None, active=None, count_trades=False):
+    # Lockstep version of simulate() for a whole population: `picks` is
+    # (candidates x rebalance rows x top_n) and every piece of state gets a
+    # leading candidate axis. Only the PV matrix is produced (no trade log).
+    # `rank` records when each holding was opened, so cash and PV are summed
+    # in the dict engine's holding order (and buys in pick order) and PV is
+    # bit-identical to simulate().
+    # Stop levels may be given per candidate, and `active` (candidates x
+    # rebalance rows) lets candidates skip rebalance rows, so strategies with
+    # different calendars share one pass over the union of their dates.
+    # With count_trades the per-candidate trade count is returned as well.
+    n_dates, n_tkrs = px.shape
+    n_cand, _, top_n = picks.shape
+    trailing_stop = np.broadcast_to(config.TRAILING_STOP if trailing_stop is None else trailing_stop, (n_cand,))[:, None]
+    stop_loss = np.broadcast_to(config.FIXED_STOP_LOSS if stop_loss is None else stop_loss, (n_cand,))[:, None]
+    buy_cost = 1 + config.SLIPPAGE_BPS/10000.0
+    sell_net = 1 - config.SLIPPAGE_BPS/10000.0
+
+    held = np.zeros((n_cand, n_tkrs), dtype=bool)
+    shares = np.zeros((n_cand, n_tkrs), dtype=np.int64)
+    entry = np.zeros((n_cand, n_tkrs))
+    peak = np.zeros((n_cand, n_tkrs))
+    rank = np.zeros((n_cand, n_tkrs), dtype=np.int64)
+    opened = 0
+    cash = np.full(n_cand, config.INITIAL_CASH)
+    pv = np.empty((n_cand, n_dates))
+    n_trades = np.zeros(n_cand, dtype=np.int64)
+    cand = np.arange(n_cand)[:, None]
+    reb_slot = {int(i): r for r, i in enumerate(reb_rows)}
+    # held columns in holding order, padded with unheld ones to the largest
+    # book; rebuilt at each rebalance
+    book = np.zeros((n_cand, 0), dtype=np.intp)
+    book_held = np.zeros((n_cand, 0), dtype=bool)
+    book_shares = np.zeros((n_cand, 0), dtype=np.int64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for i in range(n_dates):
+            p = px[i]
+            quoted = ~np.isnan(p)
+
+            # Evaluate stops
+            live = held & quoted
+            if live.any():
+                peak = np.where(live, np.fmax(peak, p), peak)
+                dd_from_peak = np.where(peak > 0, (peak - p) / peak, 0.0)
+                loss_from_entry = np.where(entry > 0, (entry - p) / entry, 0.0)
+                trail = live & (dd_from_peak >= trailing_stop)
+                hit = trail | (live & (loss_from_entry >= stop_loss))
+                if hit.any():
+                    cash = _ordered_sum(cash, np.where(hit, shares * p * sell_net, 0.0), book)
+                    held &= ~hit
+                    n_trades += hit.sum(axis=1)
+                    # exits keep the order of what is left
+                    book_held &= ~np.take_along_axis(hit, book, axis=1)
+
+            # Rebalance monthly
+            r = reb_slot.get(i)
+            if r is not None:
+                chosen = picks[:, r]
+                picked = chosen >= 0
+                in_picks = np.zeros((n_cand, n_tkrs), dtype=bool)
+                in_picks[np.broadcast_to(cand, chosen.shape)[picked], chosen[picked]] = True
+                if active is not None:
+                    # idle candidates keep their book: picks = current holdings
+                    idle = ~active[:, r]
+                    in_picks[idle] = held[idle]
+
+                drop = held & ~in_picks & quoted
+                cash = _ordered_sum(cash, np.where(drop, shares * p * sell_net, 0.0), book)
+                held &= ~drop
+                n_trades += drop.sum(axis=1)
+
+                new = in_picks & ~held
+                n_new = new.sum(axis=1)
+                alloc = np.where(n_new > 0, cash / np.maximum(n_new, 1), 0.0)
+                n = np.floor(alloc[:, None] / (p * buy_cost))
+                buy = new & quoted & (p > 0) & (n > 0)
+                shares = np.where(buy, n, shares).astype(np.int64)
+                entry = np.where(buy, p, entry)
+                peak = np.where(buy, p, peak)
+                # buys happen in pick order
+                slot = np.where(picked, chosen, 0)
+                bought = picked & np.take_along_axis(buy, slot, axis=1)
+                rows, k = np.nonzero(bought)
+                rank[rows, chosen[rows, k]] = opened + k
+                opened += top_n
+                held |= buy
+                cash = _ordered_sum(cash, np.where(bought, -(shares[cand, slot] * p[slot] * buy_cost), 0.0),
+                                    np.broadcast_to(np.arange(top_n), chosen.shape))
+                n_trades += buy.sum(axis=1)
+
+                order = np.argsort(np.where(held, rank, np.iinfo(np.int64).max), axis=1, kind='stable')
+                book = order[:, :held.sum(axis=1).max()]
+                book_held = np.take_along_axis(held, book, axis=1)
+                book_shares = np.take_along_axis(shares, book, axis=1)
+
+            # Mark-to-market
+            pb = p[book]
+            value = np.where(book_held & ~np.isnan(pb), book_shares * pb, 0.0)
+            pv[:, i] = cash + (np.cumsum(value, axis=1)[:, -1] if value.shape[1] else 0.0)
+
+    if count_trades:
+        # plus the final liquidation of every quoted holding
+        n_trades += (held & ~np.isnan(px[-1])).sum(axis=1)
+        return pv, n_trades
+    return pv
@@ -0,0 +1,247 @@
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import config, data, kernels, signals
+from indicators import INDICATOR_NAMES, ZScoreTensor, compute_indicators, score_from_weights
+from incremental import IncrementalIndicators
+from service import SignalState
+from sharded import sharded_panel
+from backtest import monthly_rebalance_dates, pick_matrix, run_backtest_numpy, run_backtest_pandas
+from genetic_algorithm import evaluate, evaluate_population, optimize_weights
+import ga_optimizer
+from fitness_cache import FitnessCache, strategy_params
+from profiling import stage_memory, memory_report
+
+def synthetic_prices(n_tickers: int = 300, years: int = 5, seed: int = 0, nan_frac: float = 0.01,
+                     suspension_prob: float = 0.2, split_prob: float = 0.3) -> pd.DataFrame:
+    """Seeded B3-like close panel: dates x tickers, BRL price levels.
+
+    Per-ticker drift/vol, scattered missing quotes, multi-week suspensions,
+    late listings and split-like level jumps (2:1, 1:2, 3:1) so cleaning,
+    rolling windows and stops all see realistic edge cases.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2010-01-04', periods=252 * years, name='Date')
+    n_dates = len(dates)
+    vol = rng.uniform(0.012, 0.04, n_tickers)
+    drift = rng.normal(0.0003, 0.0004, n_tickers)
+    rets = rng.standard_normal((n_dates, n_tickers)) * vol + drift
+    px = np.exp(np.cumsum(rets, axis=0)) * rng.lognormal(np.log(15), 0.8, n_tickers)
+
+    for j in np.flatnonzero(rng.random(n_tickers) < split_prob):
+        at = rng.integers(1, n_dates)
+        px[at:, j] *= rng.choice([0.5, 2.0, 1/3])
+    for j in np.flatnonzero(rng.random(n_tickers) < suspension_prob):
+        at = rng.integers(0, n_dates)
+        px[at:at + rng.integers(5, 40), j] = np.nan
+    late = rng.random(n_tickers) < 0.1
+    for j in np.flatnonzero(late):
+        px[:rng.integers(0, n_dates // 3), j] = np.nan
+    px[rng.random(px.shape) < nan_frac] = np.nan
+
+    cols = [f'S{j:04d}3.SA' for j in range(n_tickers)]
+    return pd.DataFrame(px, index=dates, columns=cols)
+
+def _weights(seed: int) -> dict:
+    w = np.random.default_rng(seed).random(len(INDICATOR_NAMES))
+    return dict(zip(INDICATOR_NAMES, w / w.sum()))
+
+def _timed(fn, repeat: int):
+    best, out = np.inf, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+def run_stages(raw: pd.DataFrame, repeat: int = 3, seed: int = 0) -> dict:
+    # Times are best-of-`repeat` wall seconds; memory comes from a separate
+    # tracemalloc pass so tracing does not distort the timings.
+    weights = _weights(seed)
+    prices = data.clean_prices(raw)
+    reb = monthly_rebalance_dates(prices.index, config.REB_FREQ)
+    indicators = compute_indicators(prices)
+    tensor = ZScoreTensor(indicators, dates=reb)
+    score = score_from_weights(indicators, weights)
+    cells = prices.size
+    pop = [np.random.default_rng(seed + k).random(len(INDICATOR_NAMES)) for k in range(config.GA_POP_SIZE)]
+
+    def generation():
+        return optimize_weights(prices, config.TOP_N, seed, config.GA_POP_SIZE, 1, config.GA_CROSSOVER_RATE,
+                                config.GA_MUTATION_RATE, config.GA_ELITISM, tensor=tensor,
+                                cache=FitnessCache(prices, strategy_params(config.TOP_N), size=0, tensor=tensor))
+
+    stages = {
+        'clean_prices': (lambda: data.clean_prices(raw), raw.size, 'cells'),
+        'compute_indicators': (lambda: compute_indicators(prices), cells, 'cells'),
+        'zscore_tensor': (lambda: ZScoreTensor(indicators, dates=reb), cells, 'cells'),
+        'score_from_weights': (lambda: score_from_weights(indicators, weights), cells, 'cells'),
+        'run_backtest': (lambda: run_backtest_numpy(prices, score, config.TOP_N), cells, 'cells'),
+        'run_backtest_pandas': (lambda: run_backtest_pandas(prices, score, config.TOP_N), cells, 'cells'),
+        'evaluate_population': (lambda: evaluate_population(pop, prices, config.TOP_N, tensor), len(pop), 'candidates'),
+        'ga_generation': (generation, config.GA_POP_SIZE, 'candidates'),
+    }
+    out = {}
+    for name, (fn, units, unit) in stages.items():
+        seconds, _ = _timed(fn, repeat)
+        memory_report(reset=True)
+        with stage_memory(name):
+            fn()
+        out[name] = {
+            'seconds': seconds,
+            'throughput': units / seconds if seconds > 0 else float('inf'),
+            'unit': f'{unit}/s',
+            'peak_mb': memory_report(reset=True)[name],
+        }
+    return out
+
+def check_equivalence(raw: pd.DataFrame, seed: int = 0) -> dict:
+    """Compare the alternate engines against their reference implementations."""
+    weights = _weights(seed)
+    prices = data.clean_prices(raw)
+    reb = monthly_rebalance_dates(prices.index, config.REB_FREQ)
+    indicators = compute_indicators(prices)
+    score = score_from_weights(indicators, weights)
+    checks = {}
+
+    a = run_backtest_pandas(prices, score, config.TOP_N)
+    b = run_backtest_numpy(prices, score, config.TOP_N)
+    checks['run_backtest_numpy'] = bool(a['pv'].equals(b['pv']) and a['trades'].equals(b['trades']))
+
+    full = ZScoreTensor(indicators)
+    checks['zscore_tensor'] = bool(score_from_weights(full, weights).equals(score))
+    lazy = score_from_weights(ZScoreTensor(indicators, dates=reb), weights)
+    checks['zscore_tensor_rebalance_only'] = bool(np.allclose(lazy.to_numpy(), score.loc[reb].to_numpy(),
+                                                              rtol=1e-12, atol=1e-12, equal_nan=True))
+
+    rows = score.loc[reb].to_numpy()
+    ref = []
+    for row in rows:
+        valid = np.flatnonzero(~np.isnan(row))
+        top = valid[np.argsort(-row[valid], kind='stable')][:config.TOP_N]
+        ref.append(np.concatenate([top, np.full(config.TOP_N - len(top), -1)]))
+    checks['pick_matrix'] = bool(np.array_equal(pick_matrix(rows, config.TOP_N), np.array(ref).reshape(len(rows), -1)))
+
+    tensor = ZScoreTensor(indicators, dates=reb)
+    pop = [np.random.default_rng(seed + k).random(len(INDICATOR_NAMES)) for k in range(8)]
+    single = [evaluate(w, prices, config.TOP_N, tensor) for w in pop]
+    checks['evaluate_population'] = evaluate_population(pop, prices, config.TOP_N, tensor) == single
+
+    # the standalone GA (ga_optimizer.py): a short run end to end, and its best
+    # fitness reproduced by a direct backtest of the returned weights
+    best_w, best_fit = ga_optimizer.genetic_optimize_weights(prices, seed=seed, pop_size=4, generations=2, top_n=config.TOP_N)
+    direct = ga_optimizer.evaluate_candidate(np.array([best_w[k] for k in INDICATOR_NAMES]), prices, config.TOP_N,
+                                             ZScoreTensor(indicators))
+    checks['ga_optimizer'] = bool(np.isclose(best_fit, direct, rtol=1e-9, atol=1e-12))
+
+    split = max(len(prices) - 60, 1)
+    eng = IncrementalIndicators.from_history(prices.iloc[:split])
+    rows_out = [eng.update(prices.iloc[i]) for i in range(split, len(prices))]
+    ok = True
+    for name in INDICATOR_NAMES:
+        got = pd.DataFrame([r[name] for r in rows_out]).to_numpy()
+        ok &= np.allclose(got, indicators[name].iloc[split:].to_numpy(), rtol=1e-8, atol=1e-10, equal_nan=True)
+    checks['incremental_indicators'] = bool(ok)
+
+    # the signal service replaying the panel from its first row (no warm-up), as main.py backtests a split
+    state = SignalState(IncrementalIndicators.from_history(prices.iloc[:0]), weights)
+    pv = [state.step(dt, row)['pv'] for dt, row in prices.iterrows()]
+    checks['signal_service'] = bool(np.allclose(pv, a['pv'].to_numpy(), rtol=1e-12, atol=0.0))
+
+    # out-of-core path: raw .npy -> column-sharded clean + indicators -> blocked z-scores
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / 'raw.npy'
+        np.save(source, raw.to_numpy(dtype=float))
+        with sharded_panel(source, raw.index, raw.columns, dates=reb, shard_size=max(1, raw.shape[1] // 3),
+                           workers=2, directory=tmp) as sp:
+            got = sp['tensor'].score(weights).to_numpy()
+            checks['sharded_panel'] = bool(sp['prices'].equals(prices) and sp['tensor'].index.equals(tensor.index)
+                                           and np.allclose(got, tensor.score(weights).to_numpy(),
+                                                           rtol=1e-10, atol=1e-12, equal_nan=True))
+
+    # a zero close makes pct_change return inf, which pandas' rolling drops
+    zeroed = prices.copy()
+    zeroed.iloc[len(zeroed) // 3::7, 0] = 0.0
+    engine = config.INDICATOR_ENGINE
+    try:
+        config.INDICATOR_ENGINE = 'pandas'
+        ref, ref_zeroed = signals.compute_indicators(prices), signals.compute_indicators(zeroed)
+    finally:
+        config.INDICATOR_ENGINE = engine
+    fast, fast_zeroed = kernels.compute_indicators(prices), kernels.compute_indicators(zeroed)
+    checks['indicator_kernels'] = bool(all(
+        np.allclose(f[name].to_numpy(), r[name].to_numpy(), rtol=1e-10, atol=1e-12, equal_nan=True)
+        for f, r in ((fast, ref), (fast_zeroed, ref_zeroed)) for name in INDICATOR_NAMES))
+    eng = IncrementalIndicators.from_history(zeroed.iloc[:split])
+    rows_out = [eng.update(zeroed.iloc[i]) for i in range(split, len(zeroed))]
+    checks['incremental_zero_price'] = bool(all(
+        np.allclose(pd.DataFrame([r[name] for r in rows_out]).to_numpy(), ref_zeroed[name].iloc[split:].to_numpy(),
+                    rtol=1e-8, atol=1e-10, equal_nan=True)
+        for name in INDICATOR_NAMES))
+    return checks
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    regressions = []
+    for name, stat in current.items():
+        ref = baseline.get(name)
+        if not ref:
+            print(f'  no baseline for {name}; rerun with --save to gate it')
+        elif stat['seconds'] > ref['seconds'] * (1 + threshold):
+            regressions.append(f"{name}: {stat['seconds']:.4f}s vs baseline {ref['seconds']:.4f}s")
+    return regressions
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description='Stage timings, peak memory and engine equivalence on synthetic panels.')
+    ap.add_argument('--sizes', default=config.BENCH_SIZES, help="comma list of TICKERSxYEARS, e.g. '100x1,1000x10'")
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--threshold', type=float, default=config.BENCH_THRESHOLD, help='allowed slowdown vs baseline')
+    ap.add_argument('--baseline', default=str(config.BENCH_BASELINE))
+    ap.add_argument('--save', action='store_true', help='write the results as the new baseline')
+    args = ap.parse_args(argv)
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = {}
+
+    failed = False
+    results = {}
+    for size in args.sizes.split(','):
+        n_tickers, years = (int(x) for x in size.lower().split('x'))
+        raw = synthetic_prices(n_tickers, years, seed=args.seed)
+        stages = run_stages(raw, repeat=args.repeat, seed=args.seed)
+        checks = check_equivalence(raw, seed=args.seed)
+        results[size] = stages
+
+        print(f'== {n_tickers} tickers x {years}y ==')
+        print(pd.DataFrame(stages).T.to_string())
+        for name, ok in checks.items():
+            print(f'  equivalence {name}: {"ok" if ok else "MISMATCH"}')
+            failed |= not ok
+        if size not in baseline:
+            # no timings to compare against: the gate cannot pass, only --save can seed it
+            print(f'  NO BASELINE for {size} in {args.baseline}; run with --save on the reference machine')
+            failed |= not args.save
+            continue
+        for line in compare(stages, baseline[size], args.threshold):
+            print('  REGRESSION', line)
+            failed = True
+
+    if args.save:
+        baseline.update(results)
+        baseline['_meta'] = {'python': sys.version.split()[0], 'numpy': np.__version__,
+                             'pandas': pd.__version__, 'machine': platform.machine()}
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
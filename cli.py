@@ -0,0 +1,85 @@
+"""Command line entry point for the pipeline stages.
+
+    python cli.py ingest                     # parse, clean and align the input CSVs
+    python cli.py optimize                   # GA on the training split -> chosen_weights.json
+    python cli.py backtest [--weights FILE]  # train/test backtests -> pv_*.csv, trades_*.csv
+    python cli.py report                     # stats and plots from the pv/trades CSVs
+    python cli.py sweep [--weights FILE]     # parameter sweep -> sweep_stats.csv
+
+Every stage reads and writes the usual files under config.OUT_DIR and reuses
+the main.py stage cache, so stages can run on their own. Modules are imported
+inside the commands: `--help` needs only argparse, and nothing but `report`
+loads matplotlib.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+def _ingest(args):
+    import main
+    from pipeline import Pipeline
+    pipe = Pipeline()
+    prices, ibov = main.load_panel(pipe)
+    print(f'{prices.shape[1]} tickers x {prices.shape[0]} dates ({prices.index.min().date()} .. {prices.index.max().date()})')
+    return pipe
+
+def _optimize(args):
+    import main
+    from pipeline import Pipeline
+    pipe = Pipeline()
+    prices, ibov = main.load_panel(pipe)
+    tr, _ = main.split(prices, ibov, 'train')
+    ga = main.optimize(pipe, tr, main.indicator_tensor(pipe, tr, 'train'))
+    print(f"Best training CAGR: {ga['fitness']}")
+    return pipe
+
+def _backtest(args):
+    import main
+    from pipeline import Pipeline
+    pipe = Pipeline()
+    weights = main.load_weights(args.weights)
+    prices, ibov = main.load_panel(pipe)
+    for name in args.split:
+        px, _ = main.split(prices, ibov, name)
+        pv, trades = main.backtest(pipe, px, main.indicator_tensor(pipe, px, name), weights, name)
+        print(f'{name}: final PV {pv.iloc[-1]:,.2f}, {len(trades)} trades')
+    return pipe
+
+def _report(args):
+    import main
+    from pipeline import Pipeline
+    pipe = Pipeline()
+    ibov = main.load_benchmark(pipe)
+    main.report({name: main.load_backtest(name) for name in args.split}, ibov)
+    return pipe
+
+def _sweep(args):
+    import sweep
+    return sweep.main(args.weights)
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='cli.py', description='Run one stage of the strategy pipeline.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('ingest', help='parse, clean and align prices and IBOV').set_defaults(fn=_ingest)
+    sub.add_parser('optimize', help='run the GA on the training split').set_defaults(fn=_optimize)
+    for name, fn, text in (('backtest', _backtest, 'backtest the chosen weights'),
+                           ('report', _report, 'write stats and plots from saved backtests')):
+        p = sub.add_parser(name, help=text)
+        p.add_argument('--split', nargs='+', choices=['train', 'test'], default=['train', 'test'])
+        if name == 'backtest':
+            p.add_argument('--weights', type=Path, help='weights JSON (default: OUT_DIR/chosen_weights.json)')
+        p.set_defaults(fn=fn)
+    p = sub.add_parser('sweep', help='sweep SWEEP_GRID on the training split')
+    p.add_argument('--weights', type=Path, help='weights JSON (default: OUT_DIR/chosen_weights.json)')
+    p.set_defaults(fn=_sweep)
+    return parser
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    pipe = args.fn(args)
+    if pipe is not None and pipe.loaded:
+        print('Reused stages:', ', '.join(pipe.loaded))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
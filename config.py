@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 DATA_DIR = Path('/mnt/data')
@@ -7,6 +8,16 @@ PRICES_CSV = DATA_DIR / 'precos_b3_202010-2024.csv'
 ADJCLOSE_CSV = DATA_DIR / 'precos_b3_202010-2024_adjclose.csv'
 IBOV_CSV = DATA_DIR / 'ibov_2010_2024.csv'
 USE_ADJCLOSE = True  # set False to use raw close
+DATA_CACHE = True    # parse CSVs once into memory-mappable arrays under CACHE_DIR
+DATA_CACHE_VERIFY_HASH = False  # rehash sources on every load, not only on size/mtime change
+CACHE_DIR = Path(__file__).parent / 'cache'
+INDICATOR_ENGINE = 'numpy'  # 'numpy' (2-D kernels.py) or 'pandas' (rolling/apply reference)
+PANEL_DTYPE = 'float64'   # 'float32' halves the memory of price/indicator panels
+PANEL_MEMMAP_DIR = None   # back price/indicator panels with np.memmap files in this dir
+SHARD_SIZE = 256          # sharded.py: tickers per column shard
+SHARD_ROW_BLOCK = 256     # sharded.py: dates per cross-sectional block
+SHARD_WORKERS = os.cpu_count() or 1
+SHARD_DIR = CACHE_DIR / 'shards'
 
 # Universe cleaning
 MIN_PRICE_BRL = 2.0
@@ -27,6 +38,7 @@ SLIPPAGE_BPS = 0.0    # costs ignored per case
 TOP_N = 20
 FIXED_STOP_LOSS = 0.10   # 10%
 TRAILING_STOP = 0.15     # 15%
+BACKTEST_ENGINE = 'numpy'  # 'numpy' (array engine) or 'pandas' (reference loop)
 
 # Genetic Algorithm
 GA_SEED = 42
@@ -35,6 +47,85 @@ GA_GENERATIONS = 20
 GA_CROSSOVER_RATE = 0.8
 GA_MUTATION_RATE = 0.15
 GA_ELITISM = 2
+GA_BATCH_EVAL = True   # backtest a whole generation in one lockstep pass
+GA_EXECUTOR = 'serial' # fitness step: 'serial', 'thread' or 'process'
+GA_WORKERS = os.cpu_count() or 1
+GA_CACHE_SIZE = 4096   # in-memory LRU entries
+GA_CACHE_TOL = 1e-9    # weight quantization step for cache keys
+GA_CACHE_PERSIST = False  # also keep fitness on disk under GA_CACHE_DIR
+GA_SUCCESSIVE_HALVING = False  # screen candidates on trailing sub-periods before full backtests
+GA_SH_RUNGS = (0.25, 0.5)      # cheap fidelities, as fractions of the training history
+GA_SH_KEEP = 0.5               # share of candidates promoted at each rung
+GA_EARLY_STOP = False          # stop before GA_GENERATIONS once the run has converged
+GA_PATIENCE = 5                # ... best fitness gained <= GA_MIN_DELTA over this many generations
+GA_MIN_DELTA = 1e-4
+GA_DIVERSITY_FLOOR = 1e-3      # ... or population_diversity fell below this (0 disables)
+
+# Weight optimizer (optimizers.py): 'ga' (genetic_algorithm.py), 'cmaes' or 'de'
+OPTIMIZER = 'ga'
+OPT_BUDGET = 320     # full-length backtests (cache misses) per optimizers.optimize run
+CMA_SIGMA0 = 0.5     # initial step size in softmax-logit space
+DE_F = 0.6
+DE_CR = 0.9
+OPT_STALL = 20       # stop after this many generations without a single uncached candidate
+
+# Multi-seed experiments (experiments.py): every seed x variant is one GA run
+EXP_SEEDS = (0, 1, 2, 3, 4)
+EXP_GRID = {             # GA / strategy fields only; the indicator tensors are shared by all runs
+    'GA_POP_SIZE': [16, 32],
+    'GA_MUTATION_RATE': [0.15],
+    'TOP_N': [20],
+}
+EXP_WORKERS = os.cpu_count() or 1
+
+# Parameter sweep (sweep.py): every combination runs in one lockstep pass
+SWEEP_GRID = {
+    'TOP_N': [10, 15, 20, 30],
+    'FIXED_STOP_LOSS': [0.05, 0.10, 0.15],
+    'TRAILING_STOP': [0.10, 0.15, 0.20],
+    'REB_FREQ': ['M', 'Q'],
+}
+
+ROLLING_WINDOW = 126   # reporting: rolling Sharpe / drawdown window in trading days
+
+# Robustness (robustness.py): bootstrap intervals written by reporting
+ROBUSTNESS = False     # opt-in: bootstrap / shuffle intervals cost a process pool per report
+ROBUST_SAMPLES = 2000   # block-bootstrap resamples and trade-order shuffles
+ROBUST_BLOCK = 21       # mean block length in trading days
+ROBUST_LEVEL = 0.90     # central interval reported
+ROBUST_SEED = 0
+ROBUST_WORKERS = os.cpu_count() or 1
+
+# Walk-forward (walkforward.py): rolling train/test windows
+WF_START = '2010-01-01'
+WF_END = '2024-12-31'
+WF_TRAIN_YEARS = 3
+WF_TEST_YEARS = 1
+WF_STEP_YEARS = 1
+WF_WORKERS = 1        # >1 runs windows concurrently in worker processes
+
+# Profiling (profiling.py): timing spans + per-generation GA telemetry
+PROFILE = False
+
+# Benchmarks (benchmark.py)
+BENCH_SIZES = '100x3,300x5'
+BENCH_THRESHOLD = 0.25   # fail when a stage is >25% slower than the baseline
+BENCH_BASELINE = Path(__file__).parent / 'benchmark_baseline.json'
+
+# Daily signal service (service.py)
+SERVICE_WEIGHTS = Path(__file__).parent / 'logs' / 'chosen_weights.json'
+SERVICE_DROP_DIR = Path(__file__).parent / 'incoming'  # new bars as CSV / JSON-lines files (write *.tmp, then rename); None disables
+SERVICE_HOST = '127.0.0.1'
+SERVICE_PORT = 8765           # JSON-lines bars over TCP; 0 disables
+SERVICE_POLL_SECONDS = 1.0
+SERVICE_SNAPSHOT_EVERY = 1    # bars between state snapshots
+SERVICE_LATENCY_MS = 50.0     # per-bar budget; signals over it are flagged
 
 OUT_DIR = Path(str(Path(__file__).parent / 'outputs'))
-OUT_DIR.mkdir(parents=True, exist_ok=True)
\ No newline at end of file
+OUT_DIR.mkdir(parents=True, exist_ok=True)
+GA_CACHE_DIR = OUT_DIR / 'fitness_cache'
+STAGE_CACHE = True   # main.py reuses stage artifacts whose inputs, config and code are unchanged
+STAGE_DIR = OUT_DIR / 'stages'
+TELEMETRY_PATH = OUT_DIR / 'ga_telemetry.jsonl'
+SERVICE_SNAPSHOT = OUT_DIR / 'service_state.pkl'
+SERVICE_SIGNALS = OUT_DIR / 'signals.jsonl'
@@ -1,15 +1,110 @@
+import hashlib
+import json
+import os
+from pathlib import Path
 import pandas as pd
 import numpy as np
 import config
+from panel import as_panel
+from profiling import timed
 
-def load_prices() -> pd.DataFrame:
-    path = config.ADJCLOSE_CSV if config.USE_ADJCLOSE else config.PRICES_CSV
+# bump when the parsers below change so stale caches are rebuilt
+_CACHE_VERSION = 2
+
+def _file_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _atomic_write(path: Path, write):
+    # write(f) into a temp file next to `path`, then rename it over `path`
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    with open(tmp, 'wb') as f:
+        write(f)
+    os.replace(tmp, path)
+
+def _cached_frame(path, parse) -> pd.DataFrame:
+    """Parse a CSV once into <CACHE_DIR>/<name>.<digest>.{values,index}.npy and memory-map it afterwards.
+
+    The cache is rebuilt when the source size, mtime or content hash changes.
+    A size/mtime mismatch alone (e.g. the file was touched) only triggers a
+    rehash; the arrays are kept if the content is the same. Every file is
+    written to a temp name and renamed; the arrays are named by the source
+    digest and <name>.meta.json goes last, so an interrupted or concurrent
+    run never leaves a meta.json pointing at arrays of another source.
+    """
+    if not config.DATA_CACHE:
+        return parse(path)
+    values_path, index, columns = _cache_arrays(path, parse)
+    # copy-on-write map: callers may edit the frame in place, the cache file stays untouched
+    return pd.DataFrame(np.load(values_path, mmap_mode='c'), index=index, columns=columns, copy=False)
+
+def _cache_arrays(path, parse):
+    # (values .npy path, index, columns) of the cached parse of `path`
+    src = Path(path)
+    st = src.stat()
+    cache_dir = Path(config.CACHE_DIR)
+    meta_path = cache_dir / f'{src.name}.meta.json'
+
+    def arrays(digest):
+        return (cache_dir / f'{src.name}.{digest[:16]}.values.npy',
+                cache_dir / f'{src.name}.{digest[:16]}.index.npy')
+
+    meta = json.loads(meta_path.read_text()) if meta_path.exists() else None
+    if meta is not None and meta.get('version') != _CACHE_VERSION:
+        meta = None
+    if meta is not None and (config.DATA_CACHE_VERIFY_HASH or (meta['size'], meta['mtime_ns']) != (st.st_size, st.st_mtime_ns)):
+        if _file_digest(src) != meta['sha256']:
+            meta = None
+        else:
+            meta.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+            _atomic_write(meta_path, lambda f: f.write(json.dumps(meta).encode()))
+
+    if meta is None or not all(p.exists() for p in arrays(meta['sha256'])):
+        df = parse(src)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        digest = _file_digest(src)
+        values_path, index_path = arrays(digest)
+        _atomic_write(values_path, lambda f: np.save(f, df.to_numpy(dtype=float)))
+        _atomic_write(index_path, lambda f: np.save(f, df.index.values.astype('datetime64[ns]')))
+        meta = {
+            'version': _CACHE_VERSION,
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'sha256': digest,
+            'index_name': df.index.name,
+            'columns': [str(c) for c in df.columns],
+        }
+        _atomic_write(meta_path, lambda f: f.write(json.dumps(meta).encode()))
+        # arrays of earlier versions of the source
+        for old in cache_dir.glob(f'{src.name}.*.npy'):
+            if old not in (values_path, index_path):
+                old.unlink(missing_ok=True)
+
+    values_path, index_path = arrays(meta['sha256'])
+    index = pd.DatetimeIndex(np.load(index_path), name=meta['index_name'])
+    return values_path, index, pd.Index(meta['columns'])
+
+def _parse_prices(path) -> pd.DataFrame:
     df = pd.read_csv(path, parse_dates=['Date']).sort_values('Date').set_index('Date')
     df = df.apply(pd.to_numeric, errors='coerce')
     return df
 
-def load_ibov() -> pd.Series:
-    df = pd.read_csv(config.IBOV_CSV, parse_dates=['Date']).sort_values('Date')
+@timed('load_prices')
+def load_prices() -> pd.DataFrame:
+    path = config.ADJCLOSE_CSV if config.USE_ADJCLOSE else config.PRICES_CSV
+    return _cached_frame(path, _parse_prices)
+
+def price_arrays():
+    # on-disk (dates x tickers) .npy of the raw prices plus its labels, for
+    # code that streams column blocks instead of loading the panel
+    path = config.ADJCLOSE_CSV if config.USE_ADJCLOSE else config.PRICES_CSV
+    return _cache_arrays(path, _parse_prices)
+
+def _parse_ibov(path) -> pd.DataFrame:
+    df = pd.read_csv(path, parse_dates=['Date']).sort_values('Date')
     cols = [c for c in df.columns if c.lower() != 'date']
     if not cols:
         raise ValueError('IBOV CSV must have a price column besides Date.')
@@ -23,8 +118,13 @@ def load_ibov() -> pd.Series:
              .str.replace(',', '.', regex=False)
         )
     s = pd.to_numeric(s, errors='coerce')
-    return s
+    return s.to_frame()
+
+@timed('load_ibov')
+def load_ibov() -> pd.Series:
+    return _cached_frame(config.IBOV_CSV, _parse_ibov).iloc[:, 0]
 
+@timed('clean_prices')
 def clean_prices(prices: pd.DataFrame) -> pd.DataFrame:
     missing_ratio = prices.isna().mean()
     keep = missing_ratio[missing_ratio <= config.MAX_MISSING_RATIO].index
@@ -39,8 +139,9 @@ def clean_prices(prices: pd.DataFrame) -> pd.DataFrame:
     rets = prices.pct_change()
     bad = rets.columns[(rets.abs() > config.MAX_ABS_DAILY_RET_FOR_TICKER).any()]
     prices = prices.drop(columns=bad, errors='ignore')
-    return prices
+    return as_panel(prices, 'prices')
 
+@timed('align')
 def align_with_benchmark(prices: pd.DataFrame, ibov: pd.Series):
     idx = prices.index.intersection(ibov.index)
     return prices.loc[idx], ibov.loc[idx]
\ No newline at end of file
@@ -0,0 +1,158 @@
+import itertools
+import json
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import config
+from indicators import INDICATOR_NAMES, score_from_weights
+from genetic_algorithm import optimize_weights
+from backtest import run_backtest
+from parallel import share_panel, panel_views, worker_config, _publish, _attach
+from utils import stats_from_pv
+
+# changing these would need other indicator tensors than the shared ones
+_FIXED_FIELDS = ['REB_FREQ', 'INDICATOR_ENGINE', 'TRAIN_START', 'TRAIN_END', 'TEST_START', 'TEST_END']
+
+_WORKER = {}
+
+def variants(grid: dict = None) -> list:
+    # one dict of config overrides per combination of `grid`
+    grid = config.EXP_GRID if grid is None else grid
+    fixed = set(grid) & set(_FIXED_FIELDS)
+    if fixed:
+        raise ValueError(f'Cannot vary {sorted(fixed)} across runs that share indicator tensors')
+    return [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+
+def _init_worker(spec, ctx, cfg):
+    for key, value in cfg.items():
+        setattr(config, key, value)
+    blocks, arrays = _attach(spec)
+    _WORKER.update(blocks=blocks, arrays=arrays, ctx=ctx)
+
+def _views(arrays: dict, ctx: dict, split: str):
+    return panel_views({k: arrays[f'{split}_{k}'] for k in ('px', 'z', 'empty')}, ctx[split])
+
+def _run(arrays: dict, ctx: dict, overrides: dict, seed: int) -> dict:
+    cfg = {key: getattr(config, key) for key in overrides}
+    for key, value in overrides.items():
+        setattr(config, key, value)
+    try:
+        px_tr, z_tr = _views(arrays, ctx, 'train')
+        px_te, z_te = _views(arrays, ctx, 'test')
+        best_w, best_fit = optimize_weights(
+            px_tr,
+            top_n=config.TOP_N,
+            seed=seed,
+            pop_size=config.GA_POP_SIZE,
+            generations=config.GA_GENERATIONS,
+            crossover_rate=config.GA_CROSSOVER_RATE,
+            mutation_rate=config.GA_MUTATION_RATE,
+            elitism=config.GA_ELITISM,
+            tensor=z_tr
+        )
+        res = run_backtest(px_te, score_from_weights(z_te, best_w), config.TOP_N)
+        return {'weights': best_w, 'train_fitness': best_fit, 'oos': stats_from_pv(res['pv'], len(res['trades']))}
+    finally:
+        for key, value in cfg.items():
+            setattr(config, key, value)
+
+def _run_task(task):
+    return _run(_WORKER['arrays'], _WORKER['ctx'], *task)
+
+def run_experiments(prices_train: pd.DataFrame, tensor_train, prices_test: pd.DataFrame, tensor_test,
+                    seeds=None, grid=None, workers: int = None) -> pd.DataFrame:
+    """One GA run per (variant of `grid`, seed), trained on the training split
+    and backtested on the test split.
+
+    Prices and indicator tensors of both splits are built once by the caller
+    and published through shared memory; each worker attaches to them in its
+    initializer, so a task only carries its overrides and seed. Every run uses
+    a serial fitness executor since the runs already occupy the workers.
+    Returns one row per run: overrides, seed, train fitness, out-of-sample
+    stats and weights.
+    """
+    seeds = list(config.EXP_SEEDS if seeds is None else seeds)
+    workers = max(1, int(config.EXP_WORKERS if workers is None else workers))
+    arrays, ctx = {}, {}
+    for split, px, tensor in (('train', prices_train, tensor_train), ('test', prices_test, tensor_test)):
+        a, ctx[split] = share_panel(px, tensor)
+        arrays.update({f'{split}_{k}': v for k, v in a.items()})
+    tasks = [(v, s) for v in variants(grid) for s in seeds]
+
+    executor = config.GA_EXECUTOR
+    config.GA_EXECUTOR = 'serial'
+    try:
+        if workers > 1 and len(tasks) > 1:
+            blocks, spec = _publish(arrays)
+            cfg = worker_config()
+            try:
+                with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_init_worker,
+                                         initargs=(spec, ctx, cfg)) as pool:
+                    results = list(pool.map(_run_task, tasks))
+            finally:
+                for shm in blocks:
+                    shm.close()
+                    shm.unlink()
+        else:
+            results = [_run(arrays, ctx, *t) for t in tasks]
+    finally:
+        config.GA_EXECUTOR = executor
+
+    rows = []
+    for (overrides, seed), r in zip(tasks, results):
+        rows.append({**overrides, 'seed': seed, 'train_fitness': r['train_fitness'],
+                     **{f'oos_{k}': v for k, v in r['oos'].items()}, **r['weights']})
+    return pd.DataFrame(rows)
+
+def weight_stability(weights: pd.DataFrame) -> dict:
+    # dispersion of the chosen weights across seeds (rows = runs)
+    w = weights.to_numpy(dtype=float)
+    unit = w / np.linalg.norm(w, axis=1, keepdims=True)
+    cos = unit @ unit.T
+    n = len(w)
+    top = w.argmax(axis=1)
+    stats = {
+        'mean_pairwise_cosine': float((cos.sum() - n) / (n * (n - 1))) if n > 1 else 1.0,
+        'mean_weight_std': float(w.std(axis=0, ddof=1).mean()) if n > 1 else 0.0,
+        'top_indicator': weights.columns[np.bincount(top).argmax()],
+        'top_indicator_share': float(np.bincount(top).max() / n),
+    }
+    stats.update({f'std_{c}': float(v) for c, v in weights.std(ddof=1).items()})
+    return stats
+
+def summarize(runs: pd.DataFrame, keys=None) -> pd.DataFrame:
+    """Per variant: mean and std of train fitness and out-of-sample stats over
+    seeds, mean weights, and weight_stability."""
+    keys = list(config.EXP_GRID if keys is None else keys)
+    metrics = [c for c in runs.columns if c == 'train_fitness' or c.startswith('oos_')]
+    rows = []
+    for values, g in runs.groupby(keys, sort=False):
+        values = values if isinstance(values, tuple) else (values,)
+        row = {**dict(zip(keys, values)), 'runs': len(g)}
+        for m in metrics:
+            row[f'{m}_mean'] = g[m].mean()
+            row[f'{m}_std'] = g[m].std(ddof=1)
+        row.update({f'mean_{c}': g[c].mean() for c in INDICATOR_NAMES})
+        row.update(weight_stability(g[INDICATOR_NAMES]))
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+def main():
+    from main import load_panel, split, indicator_tensor
+    from pipeline import Pipeline
+    out = config.OUT_DIR
+    pipe = Pipeline()
+    prices, ibov = load_panel(pipe)
+    tr, _ = split(prices, ibov, 'train')
+    te, _ = split(prices, ibov, 'test')
+    runs = run_experiments(tr, indicator_tensor(pipe, tr, 'train'), te, indicator_tensor(pipe, te, 'test'))
+    summary = summarize(runs)
+    runs.to_csv(out / 'experiment_runs.csv', index=False)
+    summary.to_csv(out / 'experiment_summary.csv', index=False)
+    print(json.dumps(summary.set_index(list(config.EXP_GRID))[['train_fitness_mean', 'oos_CAGR_mean', 'oos_CAGR_std',
+                                                           'mean_pairwise_cosine']].reset_index().to_dict('records'),
+                     indent=2, default=str))
+    print('Done. Outputs in:', out)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+from contextlib import ExitStack
+import numpy as np
+import pandas as pd
+import config
+from fitness_cache import FitnessCache, strategy_params
+from indicators import ZScoreTensor
+from parallel import FitnessExecutor, share_panel
+
+class SuccessiveHalving:
+    """Successive-halving screen in front of the full-length fitness step.
+
+    Each rung backtests the surviving candidates on the trailing `fraction` of
+    the training panel (cheapest rung first) and promotes the best `keep`
+    share, never fewer than `min_keep`. Only the last survivors, plus anything
+    whose full-length fitness is already cached, get a full evaluation.
+    Screened-out candidates keep their cheap score, capped just below the
+    worst promoted fitness, so they can never outrank a fully evaluated one.
+    """
+
+    def __init__(self, prices: pd.DataFrame, tensor: ZScoreTensor, top_n: int,
+                 rungs=None, keep: float = None, min_keep: int = 1):
+        rungs = config.GA_SH_RUNGS if rungs is None else rungs
+        self.keep = config.GA_SH_KEEP if keep is None else float(keep)
+        self.min_keep = max(1, int(min_keep))
+        self.top_n = top_n
+        self.rungs = []
+        for fraction in sorted(f for f in rungs if 0 < f < 1):
+            start = prices.index[int(len(prices) * (1 - fraction))]
+            px = prices.loc[start:]
+            sliced = tensor.slice(start, None)
+            self.rungs.append({'fraction': fraction, 'prices': px, 'tensor': sliced,
+                               'cache': FitnessCache(px, strategy_params(top_n), tensor=sliced), 'map': None,
+                               'evaluations': 0})
+        self.candidates = 0
+        self.full_evaluations = 0
+
+    def open(self, fn) -> ExitStack:
+        # one executor per rung panel; close the returned stack when done
+        stack = ExitStack()
+        for rung in self.rungs:
+            arrays, ctx = share_panel(rung['prices'], rung['tensor'])
+            ctx['top_n'] = self.top_n
+            rung['map'] = stack.enter_context(FitnessExecutor(fn, arrays, ctx)).map
+        return stack
+
+    def evaluate(self, pop, cache: FitnessCache, fn):
+        """Fitness for `pop` and a mask of the entries measured at full length."""
+        fitness = np.empty(len(pop))
+        known = np.array([w in cache for w in pop], dtype=bool)
+        alive = np.flatnonzero(~known)
+        for rung in self.rungs:
+            if len(alive) <= self.min_keep:
+                break
+            f = np.asarray(rung['cache'].evaluate([pop[i] for i in alive], rung['map']))
+            rung['evaluations'] += len(alive)
+            n_keep = max(self.min_keep, int(np.ceil(len(alive) * self.keep)))
+            order = np.argsort(-f, kind='stable')
+            fitness[alive[order[n_keep:]]] = f[order[n_keep:]]
+            alive = np.sort(alive[order[:n_keep]])
+        full = known.copy()
+        full[alive] = True
+        f = np.asarray(cache.evaluate([pop[i] for i in np.flatnonzero(full)], fn))
+        fitness[full] = f
+        fitness[~full] = np.minimum(fitness[~full], np.nextafter(f.min(), -np.inf))
+        self.candidates += len(pop)
+        self.full_evaluations += int(full.sum())
+        return fitness.tolist(), full
+
+    def stats(self) -> dict:
+        return {
+            'candidates': self.candidates,
+            'full_evaluations': self.full_evaluations,
+            'saved_full_evaluations': self.candidates - self.full_evaluations,
+            'rung_evaluations': {r['fraction']: r['evaluations'] for r in self.rungs},
+        }
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import config
+from pipeline import code_fingerprint
+
+# modules whose code decides a fitness value; a change to any of them retires old disk entries
+FITNESS_CODE = ['backtest', 'indicators', 'kernels', 'utils']
+
+def panel_hash(prices: pd.DataFrame) -> str:
+    h = hashlib.sha256()
+    h.update(np.ascontiguousarray(prices.to_numpy(dtype=float)).tobytes())
+    h.update(np.asarray(prices.index.values).tobytes())
+    h.update('\x1f'.join(map(str, prices.columns)).encode())
+    return h.hexdigest()
+
+def tensor_hash(tensor) -> str:
+    # a tensor sliced from a longer history carries warmed-up indicators, so
+    # the same price window can score differently; hash what is scored
+    h = hashlib.sha256()
+    h.update(np.ascontiguousarray(tensor.values).tobytes())
+    h.update(np.asarray(tensor.index.values).tobytes())
+    h.update('\x1f'.join(map(str, [*tensor.names, *tensor.columns])).encode())
+    return h.hexdigest()
+
+def strategy_params(top_n: int = None) -> dict:
+    return {
+        'TOP_N': config.TOP_N if top_n is None else int(top_n),
+        'FIXED_STOP_LOSS': config.FIXED_STOP_LOSS,
+        'TRAILING_STOP': config.TRAILING_STOP,
+        'REB_FREQ': config.REB_FREQ,
+        'SLIPPAGE_BPS': config.SLIPPAGE_BPS,
+        'INITIAL_CASH': config.INITIAL_CASH,
+    }
+
+class FitnessCache:
+    """Two-tier fitness cache: bounded in-memory LRU plus optional on-disk store.
+
+    Keys hash the normalized weight vector quantized to `tol`, the price panel,
+    the z-score tensor when one is given, the strategy parameters, the engine flags and the code of FITNESS_CODE,
+    so a stale entry can never be returned for a different window, config or
+    engine version. Disk entries are content-addressed files
+    (`<dir>/<key[:2]>/<key>.json`) and survive across runs.
+    """
+
+    def __init__(self, prices: pd.DataFrame, params: dict, size: int = None, directory=None, tol: float = None,
+                 tensor=None):
+        self.size = config.GA_CACHE_SIZE if size is None else int(size)
+        self.tol = config.GA_CACHE_TOL if tol is None else float(tol)
+        if directory is None and config.GA_CACHE_PERSIST:
+            directory = config.GA_CACHE_DIR
+        self.directory = Path(directory) if directory is not None else None
+        self._context = hashlib.sha256(json.dumps(
+            {'panel': panel_hash(prices), 'tensor': None if tensor is None else tensor_hash(tensor), 'params': params, 'tol': self.tol,
+             'engine': {f: getattr(config, f) for f in ('BACKTEST_ENGINE', 'GA_BATCH_EVAL', 'INDICATOR_ENGINE')},
+             'code': code_fingerprint(FITNESS_CODE)},
+            sort_keys=True, default=str).encode()).digest()
+        self._mem = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.dedup_hits = 0
+        self.misses = 0
+
+    def key(self, weights) -> str:
+        w = np.clip(np.asarray(weights, dtype=float), 0.0, None)
+        s = w.sum()
+        w = w / s if s > 0 else np.ones_like(w) / len(w)
+        q = np.round(w / self.tol).astype(np.int64)
+        return hashlib.sha256(self._context + q.tobytes()).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f'{key}.json'
+
+    def _remember(self, key: str, value: float):
+        self._mem[key] = value
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.size:
+            self._mem.popitem(last=False)
+
+    def get(self, key: str):
+        if key in self._mem:
+            self._mem.move_to_end(key)
+            self.memory_hits += 1
+            return self._mem[key]
+        if self.directory is not None:
+            path = self._path(key)
+            if path.exists():
+                value = float(json.loads(path.read_text())['fitness'])
+                self._remember(key, value)
+                self.disk_hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def __contains__(self, weights) -> bool:
+        # membership test that leaves the hit/miss counters alone
+        key = self.key(weights)
+        return key in self._mem or (self.directory is not None and self._path(key).exists())
+
+    def put(self, key: str, value: float):
+        value = float(value)
+        self._remember(key, value)
+        if self.directory is not None:
+            path = self._path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+            tmp.write_text(json.dumps({'fitness': value}))
+            os.replace(tmp, path)
+
+    def evaluate(self, pop, fn) -> list:
+        # Look every candidate up, send the distinct misses to `fn` in one call
+        # and fill the cache with the results.
+        keys = [self.key(w) for w in pop]
+        found = {}
+        todo = {}
+        for i, k in enumerate(keys):
+            if k in found or k in todo:
+                # a repeat within the population: served by the first copy
+                self.dedup_hits += 1
+                continue
+            f = self.get(k)
+            if f is None:
+                todo[k] = i
+            else:
+                found[k] = f
+        if todo:
+            for k, f in zip(todo, fn([pop[i] for i in todo.values()])):
+                self.put(k, f)
+                found[k] = float(f)
+        return [found[k] for k in keys]
+
+    def stats(self) -> dict:
+        return {'memory_hits': self.memory_hits, 'disk_hits': self.disk_hits, 'dedup_hits': self.dedup_hits,
+                'misses': self.misses}
@@ -2,8 +2,12 @@ import numpy as np
 import pandas as pd
 import random
 from typing import Dict, List, Tuple
+import config
 from backtest import run_backtest
-from signals import compute_indicators, score_from_weights, INDICATOR_NAMES
+from signals import compute_indicators, score_from_weights, INDICATOR_NAMES, ZScoreTensor
+from parallel import FitnessExecutor, share_panel, panel_views
+from fitness_cache import FitnessCache, strategy_params
+from utils import pv_cagr
 
 def _normalize(weights: np.ndarray) -> np.ndarray:
     weights = np.clip(weights, 0.0, None)
@@ -18,16 +22,19 @@ def _weights_to_dict(arr: np.ndarray) -> Dict[str, float]:
 def _fitness_from_pv(pv: pd.Series) -> float:
     if pv is None or pv.empty:
         return -1e9
-    cagr = (pv.iloc[-1] / pv.iloc[0]) ** (252/len(pv)) - 1.0
-    return float(cagr)
+    return float(pv_cagr(pv.to_numpy(dtype=float))[0])
 
-def evaluate_candidate(weights: np.ndarray, prices_train: pd.DataFrame, params: dict) -> float:
+def evaluate_candidate(weights: np.ndarray, prices_train: pd.DataFrame, top_n: int, tensor: ZScoreTensor = None) -> float:
     wdict = _weights_to_dict(_normalize(weights))
-    indicators = compute_indicators(prices_train)
+    indicators = tensor if tensor is not None else compute_indicators(prices_train)
     score = score_from_weights(indicators, wdict)
-    res = run_backtest(prices_train, {'score': score}, params)
+    res = run_backtest(prices_train, score, top_n)
     return _fitness_from_pv(res['pv'])
 
+def _fitness_chunk(pop: np.ndarray, arrays: dict, ctx: dict) -> List[float]:
+    prices_train, tensor = panel_views(arrays, ctx)
+    return [evaluate_candidate(w, prices_train, ctx['top_n'], tensor) for w in pop]
+
 def roulette_wheel_select(pop: List[np.ndarray], fitness: List[float], k: int) -> List[np.ndarray]:
     min_fit = min(fitness)
     shifted = [f - min_fit + 1e-9 for f in fitness]
@@ -63,14 +70,25 @@ def mutate(ind: np.ndarray, rate: float, scale: float = 0.1) -> np.ndarray:
 
 def genetic_optimize_weights(
     prices_train: pd.DataFrame,
-    params: dict,
+    params: dict = None,
     seed: int = 42,
     pop_size: int = 16,
     generations: int = 12,
     crossover_rate: float = 0.8,
     mutation_rate: float = 0.15,
-    elitism: int = 2
+    elitism: int = 2,
+    tensor: ZScoreTensor = None,
+    cache: FitnessCache = None,
+    top_n: int = None
 ) -> Tuple[Dict[str, float], float]:
+    # the other strategy settings (stops, slippage, REB_FREQ) come from config
+    if top_n is None:
+        top_n = (params or {}).get('TOP_N', config.TOP_N)
+    top_n = int(top_n)
+    if tensor is None:
+        tensor = ZScoreTensor(compute_indicators(prices_train))
+    if cache is None:
+        cache = FitnessCache(prices_train, strategy_params(top_n), tensor=tensor)
     random.seed(seed); np.random.seed(seed)
     dim = len(INDICATOR_NAMES)
     pop = [np.random.rand(dim) for _ in range(pop_size)]
@@ -79,27 +97,30 @@ def genetic_optimize_weights(
     best_w = None
     best_fit = -1e9
 
-    for gen in range(generations):
-        fitness = [evaluate_candidate(w, prices_train, params) for w in pop]
-        idx = int(np.argmax(fitness))
-        if fitness[idx] > best_fit:
-            best_fit = float(fitness[idx]); best_w = pop[idx].copy()
+    arrays, ctx = share_panel(prices_train, tensor)
+    ctx['top_n'] = top_n
+    with FitnessExecutor(_fitness_chunk, arrays, ctx) as executor:
+        for gen in range(generations):
+            fitness = cache.evaluate(pop, executor.map)
+            idx = int(np.argmax(fitness))
+            if fitness[idx] > best_fit:
+                best_fit = float(fitness[idx]); best_w = pop[idx].copy()
 
-        elite_idx = np.argsort(fitness)[-elitism:][::-1]
-        elites = [pop[i].copy() for i in elite_idx]
+            elite_idx = np.argsort(fitness)[-elitism:][::-1]
+            elites = [pop[i].copy() for i in elite_idx]
 
-        parents = roulette_wheel_select(pop, fitness, pop_size - elitism)
+            parents = roulette_wheel_select(pop, fitness, pop_size - elitism)
 
-        children = []
-        for i in range(0, len(parents), 2):
-            p1 = parents[i]
-            p2 = parents[(i+1) % len(parents)]
-            c1, c2 = crossover(p1, p2, crossover_rate)
-            c1 = _normalize(mutate(c1, mutation_rate))
-            c2 = _normalize(mutate(c2, mutation_rate))
-            children.extend([c1, c2])
-        children = children[:pop_size - elitism]
-        pop = elites + children
+            children = []
+            for i in range(0, len(parents), 2):
+                p1 = parents[i]
+                p2 = parents[(i+1) % len(parents)]
+                c1, c2 = crossover(p1, p2, crossover_rate)
+                c1 = _normalize(mutate(c1, mutation_rate))
+                c2 = _normalize(mutate(c2, mutation_rate))
+                children.extend([c1, c2])
+            children = children[:pop_size - elitism]
+            pop = elites + children
 
     best_weights = _weights_to_dict(_normalize(best_w))
     return best_weights, best_fit
\ No newline at end of file
@@ -1,8 +1,20 @@
 import numpy as np
+import pickle
 import random
+import time
+from pathlib import Path
+from contextlib import ExitStack
 from typing import Dict, List, Tuple
-from indicators import INDICATOR_NAMES, compute_indicators, score_from_weights
-from backtest import run_backtest
+from indicators import INDICATOR_NAMES, ZScoreTensor, compute_indicators, score_from_weights
+import config
+from backtest import run_backtest, rebalance_rows, simulate_batch, pick_matrix, monthly_rebalance_dates
+from parallel import FitnessExecutor, share_panel, panel_views
+from fitness_cache import FitnessCache, strategy_params
+from fidelity import SuccessiveHalving
+from pipeline import atomic_dump
+from utils import pv_cagr
+import profiling
+from profiling import span
 
 def _normalize(weights):
     weights = np.clip(weights, 0.0, None)
@@ -16,17 +28,80 @@ def _weights_to_dict(arr) -> Dict[str, float]:
 def _fitness(pv) -> float:
     if pv is None or len(pv) < 2:
         return -1e9
-    cagr = (pv.iloc[-1] / pv.iloc[0]) ** (252/len(pv)) - 1.0
-    return float(cagr)
+    return float(pv_cagr(pv.to_numpy(dtype=float))[0])
 
-def evaluate(weights, prices, top_n):
+def evaluate(weights, prices, top_n, tensor=None):
     from indicators import compute_indicators, score_from_weights
     wdict = _weights_to_dict(_normalize(weights))
-    indicators = compute_indicators(prices)
+    indicators = tensor if tensor is not None else compute_indicators(prices)
     score = score_from_weights(indicators, wdict)
     res = run_backtest(prices, score, top_n)
     return _fitness(res['pv'])
 
+def evaluate_population(pop, prices, top_n, tensor):
+    # Backtest every candidate of a generation in one lockstep pass. Scores are
+    # only needed on rebalance rows, so only those rows are contracted.
+    if not tensor.columns.equals(prices.columns):
+        raise ValueError('tensor columns must match the price panel')
+    reb_rows = rebalance_rows(prices.index)
+    rows = tensor.index.get_indexer(prices.index[reb_rows])
+    if (rows < 0).any():
+        raise ValueError('tensor does not cover every rebalance date')
+    with span('score'):
+        scores = np.stack([tensor.contract(_normalize(w), rows=rows) for w in pop])
+        picks = pick_matrix(scores, top_n)
+    with span('simulate'):
+        pv = simulate_batch(prices.to_numpy(dtype=float), picks, reb_rows)
+    if pv.shape[1] < 2:
+        return [-1e9] * len(pop)
+    return [float(c) for c in pv_cagr(pv)]
+
+def _fitness_chunk(pop, arrays, ctx):
+    prices, tensor = panel_views(arrays, ctx)
+    if config.GA_BATCH_EVAL:
+        return evaluate_population(pop, prices, ctx['top_n'], tensor)
+    return [evaluate(w, prices, ctx['top_n'], tensor) for w in pop]
+
+def population_diversity(pop) -> float:
+    # mean per-indicator std of the normalized weights; 0 when all agree
+    w = np.stack([_normalize(p) for p in pop])
+    return float(w.std(axis=0).mean())
+
+def stop_reason(best_history, diversity, patience=None, min_delta=None, diversity_floor=None):
+    # why the GA should stop after the last generation in best_history, or None
+    patience = config.GA_PATIENCE if patience is None else patience
+    min_delta = config.GA_MIN_DELTA if min_delta is None else min_delta
+    floor = config.GA_DIVERSITY_FLOOR if diversity_floor is None else diversity_floor
+    if patience and len(best_history) > patience and best_history[-1] - best_history[-1 - patience] <= min_delta:
+        return f'no improvement above {min_delta} in {patience} generations'
+    if floor and diversity < floor:
+        return f'population diversity {diversity:.2e} below {floor}'
+    return None
+
+def _generation_record(run, gen, pop, fitness, seconds, cache, cache_before, spans_before, full, in_process=True):
+    # `in_process` is False when backtests run in worker processes, whose spans
+    # never reach this process's totals
+    spans = profiling.span_totals()
+    stats = cache.stats()
+    misses = stats['misses'] - cache_before['misses']
+    hits = {k: stats[k] - cache_before[k] for k in ('memory_hits', 'disk_hits', 'dedup_hits')}
+    return {
+        'run': run,
+        'gen': gen,
+        'seconds': seconds,
+        'evaluations': misses,
+        'evals_per_s': misses / seconds if seconds > 0 else None,
+        'best': float(np.max(fitness)),
+        'mean': float(np.mean(fitness)),
+        'diversity': population_diversity(pop),
+        'cache_hits': sum(hits.values()),
+        'dedup_hits': hits['dedup_hits'],
+        'cache_misses': misses,
+        'score_s': spans.get('score', 0.0) - spans_before.get('score', 0.0) if in_process else None,
+        'simulate_s': sum(spans.get(k, 0.0) - spans_before.get(k, 0.0) for k in ('simulate', 'backtest')) if in_process else None,
+        'screened_out': int((~full).sum()),
+    }
+
 def roulette_wheel_select(pop, fitness, k):
     min_fit = min(fitness)
     shifted = [f - min_fit + 1e-9 for f in fitness]
@@ -59,7 +134,14 @@ def mutate(ind, rate, scale=0.1):
             if out[i] < 0: out[i] = 0.0
     return out
 
-def optimize_weights(prices_train, top_n, seed, pop_size, generations, crossover_rate, mutation_rate, elitism):
+def optimize_weights(prices_train, top_n, seed, pop_size, generations, crossover_rate, mutation_rate, elitism, tensor=None, cache=None, screen=None, checkpoint=None, history=None, info=None,
+                     max_evaluations=None, max_stall=None):
+    if tensor is None:
+        tensor = ZScoreTensor.from_prices(prices_train, dates=monthly_rebalance_dates(prices_train.index, config.REB_FREQ))
+    if cache is None:
+        cache = FitnessCache(prices_train, strategy_params(top_n), tensor=tensor)
+    if screen is None and config.GA_SUCCESSIVE_HALVING:
+        screen = SuccessiveHalving(prices_train, tensor, top_n, min_keep=elitism)
     random.seed(seed); np.random.seed(seed)
     dim = len(INDICATOR_NAMES)
     pop = [np.random.rand(dim) for _ in range(pop_size)]
@@ -67,27 +149,83 @@ def optimize_weights(prices_train, top_n, seed, pop_size, generations, crossover
 
     best_w = None
     best_fit = -1e9
+    best_history = []
+    stopped = None
+    start = 0
+    if checkpoint is not None and Path(checkpoint).exists():
+        # resume after the last completed generation, RNG streams included
+        with open(checkpoint, 'rb') as f:
+            state = pickle.load(f)
+        pop, best_w, best_fit, start = state['pop'], state['best_w'], state['best_fit'], state['gen'] + 1
+        best_history, stopped = state['best_history'], state['stopped']
+        random.setstate(state['random']); np.random.set_state(state['numpy'])
 
-    for gen in range(generations):
-        fitness = [evaluate(w, prices_train, top_n) for w in pop]
-        idx = int(np.argmax(fitness))
-        if fitness[idx] > best_fit:
-            best_fit = float(fitness[idx]); best_w = pop[idx].copy()
+    arrays, ctx = share_panel(prices_train, tensor)
+    ctx['top_n'] = top_n
+    misses0 = cache.stats()['misses']
+    run = f"{time.strftime('%Y%m%dT%H%M%S')}-seed{seed}"
+    seen, stall = 0, 0
+    with ExitStack() as stack:
+        executor = stack.enter_context(FitnessExecutor(_fitness_chunk, arrays, ctx))
+        if screen is not None:
+            stack.enter_context(screen.open(_fitness_chunk))
+        for gen in range(start, generations if stopped is None else start):
+            if profiling.enabled():
+                t0, cache_before, spans_before = time.perf_counter(), cache.stats(), profiling.span_totals()
+            with span('ga_generation'):
+                if screen is None:
+                    fitness = cache.evaluate(pop, executor.map)
+                    full = np.ones(len(pop), dtype=bool)
+                else:
+                    fitness, full = screen.evaluate(pop, cache, executor.map)
+            if profiling.enabled():
+                profiling.emit(_generation_record(run, gen, pop, fitness, time.perf_counter() - t0,
+                                                  cache, cache_before, spans_before, full,
+                                                  in_process=executor.mode != 'process'))
+            # the reported best is always a full-length fitness
+            idx = int(np.flatnonzero(full)[np.argmax(np.asarray(fitness)[full])])
+            if fitness[idx] > best_fit:
+                best_fit = float(fitness[idx]); best_w = pop[idx].copy()
+            if history is not None:
+                # fitness-vs-evaluations curve; evaluations = full-length backtests run
+                history.append({'gen': gen, 'evaluations': cache.stats()['misses'] - misses0, 'best': best_fit})
+            best_history.append(best_fit)
+            if config.GA_EARLY_STOP and gen < generations - 1:
+                stopped = stop_reason(best_history, population_diversity(pop))
+            misses = cache.stats()['misses'] - misses0
+            stall = 0 if misses > seen else stall + 1
+            seen = misses
+            if stopped is None and max_evaluations is not None and misses >= max_evaluations:
+                stopped = f'budget of {max_evaluations} evaluations reached'
+            if stopped is None and max_stall is not None and stall >= max_stall:
+                stopped = f'no new candidate in {max_stall} generations'
 
-        elite_idx = np.argsort(fitness)[-elitism:][::-1]
-        elites = [pop[i].copy() for i in elite_idx]
+            if stopped is None:
+                elite_idx = np.argsort(fitness)[-elitism:][::-1]
+                elites = [pop[i].copy() for i in elite_idx]
 
-        parents = roulette_wheel_select(pop, fitness, pop_size - elitism)
+                parents = roulette_wheel_select(pop, fitness, pop_size - elitism)
 
-        children = []
-        for i in range(0, len(parents), 2):
-            p1 = parents[i]
-            p2 = parents[(i+1) % len(parents)]
-            c1, c2 = crossover(p1, p2, crossover_rate)
-            c1 = _normalize(mutate(c1, mutation_rate))
-            c2 = _normalize(mutate(c2, mutation_rate))
-            children.extend([c1, c2])
-        children = children[:pop_size - elitism]
-        pop = elites + children
+                children = []
+                for i in range(0, len(parents), 2):
+                    p1 = parents[i]
+                    p2 = parents[(i+1) % len(parents)]
+                    c1, c2 = crossover(p1, p2, crossover_rate)
+                    c1 = _normalize(mutate(c1, mutation_rate))
+                    c2 = _normalize(mutate(c2, mutation_rate))
+                    children.extend([c1, c2])
+                children = children[:pop_size - elitism]
+                pop = elites + children
+            if checkpoint is not None:
+                atomic_dump({'gen': gen, 'pop': pop, 'best_w': best_w, 'best_fit': best_fit,
+                             'best_history': best_history, 'stopped': stopped,
+                             'random': random.getstate(), 'numpy': np.random.get_state()}, Path(checkpoint))
+            if stopped is not None:
+                break
 
+    if info is not None:
+        run_gens = len(best_history)
+        info.update({'generations': run_gens, 'stop_reason': stopped or f'reached {generations} generations',
+                     # upper bound: a skipped generation would have cost at most pop_size backtests
+                     'saved_evaluations': (generations - run_gens) * pop_size})
     return _weights_to_dict(_normalize(best_w)), best_fit
\ No newline at end of file
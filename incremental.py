@@ -0,0 +1,169 @@
+from collections import deque
+import numpy as np
+import pandas as pd
+from indicators import INDICATOR_NAMES
+from kernels import PCT_CHANGE_PADS, ewm_alpha, ewm_step, finite
+
+# (window, min_periods) of the rolling statistics in compute_indicators
+_MAX_252 = (252, 84)
+_MAX_100 = (100, 34)
+_SMA_200 = (200, 67)
+_VOL_252 = (252, 84)
+_HIST = 252
+_RSI_N = 14
+
+class IncrementalIndicators:
+    """Stateful twin of compute_indicators that advances one bar at a time.
+
+    Seed it with a history panel, then feed each new row of closes to
+    `update`, which returns the new row of every indicator in O(tickers):
+    monotonic deques for the rolling maxima, running sums/counts for the SMA
+    and the return volatility, and the recursive EWM state for RSI. Output
+    matches compute_indicators on the same data to floating-point tolerance.
+    """
+
+    def __init__(self, columns):
+        self.columns = pd.Index(columns)
+        n = len(self.columns)
+        self._t = 0
+        self._pos = 0
+        self._px = np.full((_HIST, n), np.nan)
+        self._ret = np.full((_HIST, n), np.nan)
+        self._last_pad = np.full(n, np.nan)
+        self._cnt = {w: np.zeros(n, dtype=np.int64) for w in (_MAX_252[0], _MAX_100[0], _SMA_200[0])}
+        self._sma_sum = np.zeros(n)
+        self._vol_cnt = np.zeros(n, dtype=np.int64)
+        self._vol_s1 = np.zeros(n)
+        self._vol_s2 = np.zeros(n)
+        self._max = {w: [deque() for _ in range(n)] for w in (_MAX_252[0], _MAX_100[0])}
+        self._alpha = ewm_alpha(_RSI_N)
+        self._ewm = {'up': np.full(n, np.nan), 'down': np.full(n, np.nan)}
+        self._ewm_wt = {'up': np.ones(n), 'down': np.ones(n)}
+
+    @classmethod
+    def from_history(cls, prices: pd.DataFrame) -> 'IncrementalIndicators':
+        eng = cls(prices.columns)
+        px = prices.to_numpy(dtype=float)
+        n_rows = len(px)
+
+        rets = np.full_like(px, np.nan)
+        base = pd.DataFrame(px).ffill().to_numpy() if PCT_CHANGE_PADS else px
+        if n_rows > 1:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rets[1:] = finite(base[1:] / base[:-1] - 1.0)
+        if n_rows and PCT_CHANGE_PADS:
+            eng._last_pad = base[-1].copy()
+
+        tail = min(n_rows, _HIST)
+        eng._px[_HIST - tail:] = px[n_rows - tail:]
+        eng._ret[_HIST - tail:] = rets[n_rows - tail:]
+        eng._t = n_rows
+
+        # the rolling statistics skip +-inf like NaN (see kernels.finite)
+        for w in eng._cnt:
+            eng._cnt[w] = np.isfinite(eng._px[_HIST - w:]).sum(axis=0)
+        eng._sma_sum = np.nansum(finite(eng._px[_HIST - _SMA_200[0]:]), axis=0)
+        eng._vol_cnt = (~np.isnan(eng._ret)).sum(axis=0)
+        eng._vol_s1 = np.nansum(eng._ret, axis=0)
+        eng._vol_s2 = np.nansum(eng._ret ** 2, axis=0)
+
+        for w, dqs in eng._max.items():
+            window = eng._px[_HIST - w:]
+            for j, dq in enumerate(dqs):
+                for k, v in enumerate(window[:, j]):
+                    if np.isfinite(v):
+                        while dq and dq[-1][1] <= v:
+                            dq.pop()
+                        dq.append((n_rows - w + k, v))
+
+        if n_rows > 1:
+            diff = px[1:] - px[:-1]
+            for d in diff:
+                eng._ewm_step(d)
+        return eng
+
+    def _ewm_step(self, diff: np.ndarray):
+        up = np.clip(diff, 0, None)
+        down = -np.clip(diff, None, 0)
+        for key, x in (('up', up), ('down', down)):
+            self._ewm[key], self._ewm_wt[key] = ewm_step(self._ewm[key], self._ewm_wt[key], x, self._alpha)
+
+    def _roll_max(self, w: int, p: np.ndarray, valid: np.ndarray) -> np.ndarray:
+        out = np.full(len(p), np.nan)
+        expire = self._t - w
+        for j, dq in enumerate(self._max[w]):
+            while dq and dq[0][0] <= expire:
+                dq.popleft()
+            if valid[j]:
+                v = p[j]
+                while dq and dq[-1][1] <= v:
+                    dq.pop()
+                dq.append((self._t, v))
+            if dq:
+                out[j] = dq[0][1]
+        return out
+
+    def _row(self, lag: int) -> np.ndarray:
+        return self._px[(self._pos - lag) % _HIST]
+
+    def update(self, row: pd.Series) -> dict:
+        p = row.reindex(self.columns).to_numpy(dtype=float)
+        valid = ~np.isnan(p)
+        usable = np.isfinite(p)
+        prev = self._row(1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            p21 = self._row(21)
+            mom_12_1 = p21 / self._row(252) - 1.0
+            mom_6_1 = p21 / self._row(126) - 1.0
+
+            for w in self._cnt:
+                self._cnt[w] += usable.astype(np.int64) - np.isfinite(self._row(w)).astype(np.int64)
+            leaving = self._row(_SMA_200[0])
+            self._sma_sum += np.where(usable, p, 0.0) - np.where(np.isfinite(leaving), leaving, 0.0)
+
+            max252 = self._roll_max(_MAX_252[0], p, usable)
+            max100 = self._roll_max(_MAX_100[0], p, usable)
+            max252[self._cnt[_MAX_252[0]] < _MAX_252[1]] = np.nan
+            max100[self._cnt[_MAX_100[0]] < _MAX_100[1]] = np.nan
+            prox_52w = p / max252
+            breakout_100 = (p >= max100).astype(float)
+            sma200 = np.where(self._cnt[_SMA_200[0]] >= _SMA_200[1], self._sma_sum / self._cnt[_SMA_200[0]], np.nan)
+            dist_sma200 = p / sma200
+
+            if PCT_CHANGE_PADS:
+                pad = np.where(valid, p, self._last_pad)
+                ret = pad / self._last_pad - 1.0
+                self._last_pad = pad
+            else:
+                ret = p / prev - 1.0
+            ret = finite(ret)
+            old_ret = self._ret[self._pos]
+            r_in, r_out = ~np.isnan(ret), ~np.isnan(old_ret)
+            self._vol_cnt += r_in.astype(np.int64) - r_out.astype(np.int64)
+            self._vol_s1 += np.where(r_in, ret, 0.0) - np.where(r_out, old_ret, 0.0)
+            self._vol_s2 += np.where(r_in, ret * ret, 0.0) - np.where(r_out, old_ret * old_ret, 0.0)
+            n = self._vol_cnt
+            var = (self._vol_s2 - self._vol_s1 * self._vol_s1 / n) / (n - 1)
+            low_vol_252 = np.where(n >= _VOL_252[1], -np.sqrt(np.clip(var, 0.0, None)), np.nan)
+
+            self._ewm_step(p - prev)
+            down = self._ewm['down']
+            rs = self._ewm['up'] / np.where(down == 0, np.nan, down)
+            rsi_14 = 100 - (100 / (1 + rs))
+
+        self._px[self._pos] = p
+        self._ret[self._pos] = ret
+        self._pos = (self._pos + 1) % _HIST
+        self._t += 1
+
+        values = {
+            'mom_12_1': mom_12_1,
+            'mom_6_1': mom_6_1,
+            'prox_52w': prox_52w,
+            'breakout_100': breakout_100,
+            'dist_sma200': dist_sma200,
+            'low_vol_252': low_vol_252,
+            'rsi_14': rsi_14
+        }
+        return {name: pd.Series(values[name], index=self.columns, name=row.name) for name in INDICATOR_NAMES}
@@ -1,5 +1,10 @@
 import pandas as pd
 import numpy as np
+import config
+import kernels
+from kernels import PCT_CHANGE_PADS
+from panel import as_panel
+from profiling import timed
 
 INDICATOR_NAMES = [
     'mom_12_1',
@@ -21,7 +26,11 @@ def _rsi(series: pd.Series, n: int = 14) -> pd.Series:
     rsi = 100 - (100 / (1 + rs))
     return rsi
 
+@timed('compute_indicators')
 def compute_indicators(prices: pd.DataFrame) -> dict:
+    if config.INDICATOR_ENGINE == 'numpy':
+        indicators = kernels.compute_indicators(prices)
+        return {name: as_panel(ind, name) for name, ind in indicators.items()}
     roll252 = prices.rolling(252, min_periods=84)
     roll126 = prices.rolling(126, min_periods=42)
     roll100 = prices.rolling(100, min_periods=34)
@@ -36,7 +45,7 @@ def compute_indicators(prices: pd.DataFrame) -> dict:
     low_vol_252 = -prices.pct_change().rolling(252, min_periods=84).std()
     rsi_14 = prices.apply(_rsi, n=14)
 
-    return {
+    indicators = {
         'mom_12_1': mom_12_1,
         'mom_6_1': mom_6_1,
         'prox_52w': prox_52w,
@@ -45,13 +54,83 @@ def compute_indicators(prices: pd.DataFrame) -> dict:
         'low_vol_252': low_vol_252,
         'rsi_14': rsi_14
     }
+    return {name: as_panel(ind, name) for name, ind in indicators.items()}
 
 def xsec_zscore(df: pd.DataFrame) -> pd.DataFrame:
     mean = df.mean(axis=1, skipna=True)
     std = df.std(axis=1, skipna=True).replace(0, np.nan)
     return (df.sub(mean, axis=0)).div(std, axis=0)
 
-def score_from_weights(indicators: dict, weights: dict) -> pd.DataFrame:
+class ZScoreTensor:
+    """Cross-sectionally z-scored indicators stacked as (indicator x date x ticker).
+
+    Built once per price window; scoring a weight vector is then a weighted
+    contraction over the indicator axis with no indicator recomputation.
+    """
+
+    def __init__(self, indicators: dict, dates=None):
+        # `dates` restricts the tensor (and the z-scoring work) to those rows,
+        # e.g. the rebalance dates, which are the only rows a backtest reads
+        first = next(iter(indicators.values()))
+        if dates is not None:
+            indicators = {name: ind.loc[dates] for name, ind in indicators.items()}
+            first = next(iter(indicators.values()))
+        self.names = list(indicators.keys())
+        self.index = first.index
+        self.columns = first.columns
+        self.values = np.ascontiguousarray(np.stack([
+            xsec_zscore(ind).reindex(index=self.index, columns=self.columns).to_numpy()
+            for ind in indicators.values()
+        ]))
+        # score_from_weights returns `first * 0.0` when every weight is zero
+        self._empty = first.to_numpy() * 0.0
+
+    @classmethod
+    def from_arrays(cls, names, index, columns, values: np.ndarray, empty: np.ndarray) -> 'ZScoreTensor':
+        tensor = cls.__new__(cls)
+        tensor.names = list(names)
+        tensor.index = index
+        tensor.columns = columns
+        tensor.values = values
+        tensor._empty = empty
+        return tensor
+
+    @classmethod
+    def from_prices(cls, prices: pd.DataFrame, dates=None) -> 'ZScoreTensor':
+        return cls(compute_indicators(prices), dates=dates)
+
+    def slice(self, start, end) -> 'ZScoreTensor':
+        # Row window by label, as a view. Z-scores are per date, so a slice of
+        # a tensor built on a longer history equals a tensor built on the
+        # slice, except that rolling indicators are already warmed up.
+        rows = self.index.slice_indexer(start, end)
+        return ZScoreTensor.from_arrays(self.names, self.index[rows], self.columns,
+                                        self.values[:, rows], self._empty[rows])
+
+    def weight_vector(self, weights: dict) -> np.ndarray:
+        return np.array([float(weights.get(name, 0.0)) for name in self.names])
+
+    def contract(self, w: np.ndarray, rows=None) -> np.ndarray:
+        # Zero weights are skipped (not multiplied) so NaNs in unused
+        # indicators do not leak into the score, and the remaining terms are
+        # summed in indicator order, exactly like score_from_weights.
+        z = self.values if rows is None else self.values[:, rows]
+        nz = np.flatnonzero(w)
+        w = np.asarray(w, dtype=z.dtype)
+        if not nz.size:
+            return self._empty.copy() if rows is None else self._empty[rows]
+        out = z[nz[0]] * w[nz[0]]
+        for k in nz[1:]:
+            out += z[k] * w[k]
+        return out
+
+    def score(self, weights: dict) -> pd.DataFrame:
+        return pd.DataFrame(self.contract(self.weight_vector(weights)), index=self.index, columns=self.columns)
+
+@timed('score')
+def score_from_weights(indicators, weights: dict) -> pd.DataFrame:
+    if isinstance(indicators, ZScoreTensor):
+        return indicators.score(weights)
     parts = []
     for name, ind in indicators.items():
         w = float(weights.get(name, 0.0))
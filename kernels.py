@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+# pandas < 3 forward-fills NaNs inside pct_change (fill_method='pad'), pandas
+# >= 3 does not; array re-implementations of the indicators follow suit.
+PCT_CHANGE_PADS = int(pd.__version__.split('.')[0]) < 3
+
+def shift(x: np.ndarray, n: int) -> np.ndarray:
+    out = np.full_like(x, np.nan)
+    if n < len(x):
+        out[n:] = x[:len(x) - n]
+    return out
+
+def ffill(x: np.ndarray) -> np.ndarray:
+    rows = np.where(np.isnan(x), 0, np.arange(len(x))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return x[rows, np.arange(x.shape[1])]
+
+def pct_change(x: np.ndarray) -> np.ndarray:
+    base = ffill(x) if PCT_CHANGE_PADS else x
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return base / shift(base, 1) - 1.0
+
+def finite(x: np.ndarray) -> np.ndarray:
+    # pandas' rolling and ewm treat +-inf as missing (a zero price makes
+    # pct_change return inf); so do the rolling kernels
+    return np.where(np.isfinite(x), x, np.nan)
+
+def rolling_count(valid: np.ndarray, window: int) -> np.ndarray:
+    cs = np.cumsum(valid, axis=0, dtype=np.int64)
+    out = cs.copy()
+    out[window:] -= cs[:-window]
+    return out
+
+def rolling_max(x: np.ndarray, window: int, min_periods: int) -> np.ndarray:
+    # van Herk / Gil-Werman: per-block prefix and suffix maxima give every
+    # window's max as max(suffix[start], prefix[end]) in O(rows) per column.
+    # fmax skips NaNs the way pandas' rolling max does.
+    x = finite(x)
+    n, m = x.shape
+    pad = (-n) % window
+    blocks = np.vstack([x, np.full((pad, m), np.nan, dtype=x.dtype)]).reshape(-1, window, m)
+    prefix = np.fmax.accumulate(blocks, axis=1).reshape(-1, m)[:n]
+    suffix = np.fmax.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(-1, m)[:n]
+    out = prefix.copy()
+    if n >= window:
+        out[window - 1:] = np.fmax(suffix[:n - window + 1], prefix[window - 1:])
+    out[rolling_count(~np.isnan(x), window) < min_periods] = np.nan
+    return out
+
+def _window_sums(x: np.ndarray, window: int) -> np.ndarray:
+    # float64 running sums, whatever the panel dtype
+    cs = np.cumsum(np.where(np.isnan(x), 0.0, x), axis=0, dtype=np.float64)
+    out = cs.copy()
+    out[window:] -= cs[:-window]
+    return out
+
+def rolling_mean(x: np.ndarray, window: int, min_periods: int) -> np.ndarray:
+    x = finite(x)
+    n = rolling_count(~np.isnan(x), window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = (_window_sums(x, window) / n).astype(x.dtype, copy=False)
+    out[n < max(min_periods, 1)] = np.nan
+    return out
+
+def rolling_std(x: np.ndarray, window: int, min_periods: int, ddof: int = 1) -> np.ndarray:
+    # running sums of the column-demeaned values keep the s2 - s1^2/n
+    # cancellation small; float32 returns are widened before squaring
+    dtype = x.dtype
+    x = finite(x).astype(np.float64, copy=False)
+    center = np.nanmean(np.where(np.isnan(x).all(axis=0), 0.0, x), axis=0) if len(x) else 0.0
+    d = x - center
+    n = rolling_count(~np.isnan(x), window)
+    s1 = _window_sums(d, window)
+    s2 = _window_sums(d * d, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        var = (s2 - s1 * s1 / n) / (n - ddof)
+    out = np.sqrt(np.clip(var, 0.0, None)).astype(dtype, copy=False)
+    out[(n < max(min_periods, 1)) | (n <= ddof)] = np.nan
+    return out
+
+def ewm_alpha(n: int) -> float:
+    # pandas turns alpha into a centre of mass and back; keep its rounding
+    com = (1 - 1/n) / (1/n)
+    return 1. / (1. + com)
+
+def ewm_step(mean: np.ndarray, wt: np.ndarray, x: np.ndarray, alpha: float):
+    # One row of pandas' ewm(adjust=False, ignore_na=False).mean() recursion
+    # for every column: NaN inputs carry the mean and decay the old weight.
+    had = ~np.isnan(mean)
+    obs = ~np.isnan(x)
+    wt = np.where(had, wt * (1. - alpha), wt)
+    with np.errstate(invalid='ignore'):
+        blended = np.where(mean != x, (wt * mean + alpha * x) / (wt + alpha), mean)
+    mean = np.where(had & obs, blended, np.where(~had & obs, x, mean))
+    wt = np.where(had & obs, 1., wt)
+    return mean, wt
+
+def rsi(x: np.ndarray, n: int = 14) -> np.ndarray:
+    # Wilder RSI over all columns at once; same recursion as _rsi per column
+    diff = x - shift(x, 1)
+    up = np.clip(diff, 0, None)
+    down = -np.clip(diff, None, 0)
+    alpha = ewm_alpha(n)
+    roll_up = np.empty_like(x)
+    roll_down = np.empty_like(x)
+    m_up = np.full(x.shape[1], np.nan)
+    m_down = np.full(x.shape[1], np.nan)
+    wt_up = np.ones(x.shape[1])
+    wt_down = np.ones(x.shape[1])
+    for t in range(len(x)):
+        m_up, wt_up = ewm_step(m_up, wt_up, up[t], alpha)
+        m_down, wt_down = ewm_step(m_down, wt_down, down[t], alpha)
+        roll_up[t] = m_up
+        roll_down[t] = m_down
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = roll_up / np.where(roll_down == 0, np.nan, roll_down)
+        return 100 - (100 / (1 + rs))
+
+def indicator_arrays(px: np.ndarray) -> dict:
+    """All seven indicators of compute_indicators from one (dates x tickers) array."""
+    lag21 = shift(px, 21)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'mom_12_1': lag21 / shift(px, 252) - 1.0,
+            'mom_6_1': lag21 / shift(px, 126) - 1.0,
+            'prox_52w': px / rolling_max(px, 252, 84),
+            'breakout_100': (px >= rolling_max(px, 100, 34)).astype(px.dtype),
+            'dist_sma200': px / rolling_mean(px, 200, 67),
+            'low_vol_252': -rolling_std(pct_change(px), 252, 84),
+            'rsi_14': rsi(px, 14),
+        }
+
+def compute_indicators(prices: pd.DataFrame) -> dict:
+    # keep the panel dtype (PANEL_DTYPE='float32' stays float32)
+    px = prices.to_numpy()
+    arrays = indicator_arrays(px if px.dtype.kind == 'f' else px.astype(float))
+    return {name: pd.DataFrame(arr, index=prices.index, columns=prices.columns) for name, arr in arrays.items()}
@@ -1,30 +1,79 @@
 import json
-import pandas as pd
-import config, data
-from indicators import compute_indicators, score_from_weights
-from genetic_algorithm import optimize_weights
-from backtest import run_backtest
-from utils import stats_from_pv
-from reporting import export_stats_and_plots
+import config
+from pipeline import Pipeline, source_fingerprint
 
-def main():
-    out = config.OUT_DIR
+# The stage functions import their heavy dependencies themselves, so the CLI
+# (cli.py) can run any one stage without paying for the others' imports.
 
-    # Load & clean
-    prices = data.load_prices()
-    prices = data.clean_prices(prices)
-    ibov = data.load_ibov()
+CLEAN_FIELDS = ['USE_ADJCLOSE', 'MIN_PRICE_BRL', 'MAX_ABS_DAILY_RET_FOR_TICKER', 'MAX_MISSING_RATIO',
+                'MIN_TRADED_DAYS_RATIO', 'PANEL_DTYPE']
+STRATEGY_FIELDS = ['REB_FREQ', 'INITIAL_CASH', 'SLIPPAGE_BPS', 'TOP_N', 'FIXED_STOP_LOSS', 'TRAILING_STOP',
+                   'BACKTEST_ENGINE']
+GA_FIELDS = ['GA_SEED', 'GA_POP_SIZE', 'GA_GENERATIONS', 'GA_CROSSOVER_RATE', 'GA_MUTATION_RATE', 'GA_ELITISM',
+             'GA_BATCH_EVAL', 'GA_CACHE_TOL', 'GA_SUCCESSIVE_HALVING', 'GA_SH_RUNGS', 'GA_SH_KEEP',
+             'GA_EARLY_STOP', 'GA_PATIENCE', 'GA_MIN_DELTA', 'GA_DIVERSITY_FLOOR',
+             'OPTIMIZER', 'OPT_BUDGET', 'OPT_STALL', 'CMA_SIGMA0', 'DE_F', 'DE_CR']
+BACKTEST_CODE = ['backtest', 'indicators', 'kernels']
+GA_CODE = BACKTEST_CODE + ['genetic_algorithm', 'fidelity', 'optimizers', 'fitness_cache', 'parallel', 'utils']
+SPLITS = {'train': ('TRAIN_START', 'TRAIN_END'), 'test': ('TEST_START', 'TEST_END')}
 
-    # Align
-    prices, ibov = data.align_with_benchmark(prices, ibov)
+def _ingest_stages() -> dict:
+    # key inputs of the ingest stages, shared by load_panel and load_benchmark
+    price_csv = config.ADJCLOSE_CSV if config.USE_ADJCLOSE else config.PRICES_CSV
+    return {
+        'prices': dict(fields=CLEAN_FIELDS, code=['data'], extra=source_fingerprint(price_csv)),
+        'ibov': dict(code=['data'], extra=source_fingerprint(config.IBOV_CSV)),
+        'align': dict(deps=['prices', 'ibov']),
+        'benchmark': dict(deps=['align']),
+    }
 
-    # Split
-    tr = prices.loc[config.TRAIN_START:config.TRAIN_END]
-    te = prices.loc[config.TEST_START:config.TEST_END]
-    ibov_tr = ibov.loc[tr.index.min():tr.index.max()]
-    ibov_te = ibov.loc[te.index.min():te.index.max()]
+def load_panel(pipe):
+    # cleaned prices and IBOV on their common dates; the aligned IBOV is also
+    # kept on its own ('benchmark') for load_benchmark
+    import data
+    stages = _ingest_stages()
+    prices = pipe.run('prices', lambda: data.clean_prices(data.load_prices()), **stages['prices'])
+    ibov = pipe.run('ibov', data.load_ibov, **stages['ibov'])
+    prices, ibov = pipe.run('align', lambda: data.align_with_benchmark(prices, ibov), **stages['align'])
+    pipe.run('benchmark', lambda: ibov, **stages['benchmark'])
+    return prices, ibov
 
-    # GA optimize on training
+def load_benchmark(pipe):
+    # the aligned IBOV of load_panel without reading the price panel, unless
+    # its stage is missing
+    stages = _ingest_stages()
+    for name in ('prices', 'ibov', 'align'):
+        pipe.declare(name, **stages[name])
+    return pipe.run('benchmark', lambda: load_panel(pipe)[1], **stages['benchmark'])
+
+def split(prices, ibov, name):
+    start, end = (getattr(config, f) for f in SPLITS[name])
+    px = prices.loc[start:end]
+    return px, ibov.loc[px.index.min():px.index.max()]
+
+def indicator_tensor(pipe, px, name):
+    # rebalance-date z-scores for one split
+    from indicators import ZScoreTensor
+    from backtest import monthly_rebalance_dates
+    return pipe.run(f'indicators_{name}',
+                    lambda: ZScoreTensor.from_prices(px, dates=monthly_rebalance_dates(px.index, config.REB_FREQ)),
+                    deps=['align'], fields=[*SPLITS[name], 'REB_FREQ', 'INDICATOR_ENGINE'],
+                    code=['indicators', 'kernels'])
+
+def _optimize(pipe, tr, tensor_tr):
+    from genetic_algorithm import optimize_weights
+    from fitness_cache import FitnessCache, strategy_params
+    from fidelity import SuccessiveHalving
+    cache = FitnessCache(tr, strategy_params(config.TOP_N), tensor=tensor_tr)
+    if config.OPTIMIZER != 'ga':
+        from optimizers import optimize as run_optimizer
+        best_w, best_fit, curve = run_optimizer(config.OPTIMIZER, tr, config.TOP_N, config.GA_SEED,
+                                                tensor=tensor_tr, cache=cache)
+        log = [f'Optimizer: {config.OPTIMIZER}', f'Best training CAGR: {best_fit}',
+               f'Evaluations: {int(curve["evaluations"].iloc[-1])}', f'Fitness cache: {cache.stats()}']
+        return {'weights': best_w, 'fitness': best_fit, 'log': log}
+    screen = SuccessiveHalving(tr, tensor_tr, config.TOP_N, min_keep=config.GA_ELITISM) if config.GA_SUCCESSIVE_HALVING else None
+    info = {}
     best_w, best_fit = optimize_weights(
         tr,
         top_n=config.TOP_N,
@@ -33,43 +82,105 @@ def main():
         generations=config.GA_GENERATIONS,
         crossover_rate=config.GA_CROSSOVER_RATE,
         mutation_rate=config.GA_MUTATION_RATE,
-        elitism=config.GA_ELITISM
+        elitism=config.GA_ELITISM,
+        tensor=tensor_tr,
+        cache=cache,
+        screen=screen,
+        checkpoint=pipe.checkpoint('ga') if pipe.enabled else None,
+        info=info
     )
-    (out / 'chosen_weights.json').write_text(json.dumps(best_w, indent=2, ensure_ascii=False))
+    log = [f'Best training CAGR: {best_fit}', f'Fitness cache: {cache.stats()}',
+           f"Stopped after {info['generations']} generations: {info['stop_reason']}",
+           f"Evaluations saved by early stopping: {info['saved_evaluations']}"]
+    if screen is not None:
+        log.append(f'Successive halving: {screen.stats()}')
+    return {'weights': best_w, 'fitness': best_fit, 'log': log}
+
+def optimize(pipe, tr, tensor_tr) -> dict:
+    # config.OPTIMIZER on the training split; writes chosen_weights.json and ga_log.txt
+    out = config.OUT_DIR
+    ga = pipe.run('ga', lambda: _optimize(pipe, tr, tensor_tr), deps=['indicators_train'],
+                  fields=STRATEGY_FIELDS + GA_FIELDS, code=GA_CODE)
+    (out / 'chosen_weights.json').write_text(json.dumps(ga['weights'], indent=2, ensure_ascii=False))
     with open(out / 'ga_log.txt', 'w') as f:
-        f.write(f'Best training CAGR: {best_fit}\n')
-
-    # Backtest train
-    sc_tr = score_from_weights(compute_indicators(tr), best_w)
-    res_tr = run_backtest(tr, sc_tr, config.TOP_N)
-    pv_tr, trades_tr = res_tr['pv'], res_tr['trades']
-    pv_tr.to_csv(out / 'pv_train.csv')
-    trades_tr.to_csv(out / 'trades_train.csv', index=False)
-
-    # Backtest test
-    sc_te = score_from_weights(compute_indicators(te), best_w)
-    res_te = run_backtest(te, sc_te, config.TOP_N)
-    pv_te, trades_te = res_te['pv'], res_te['trades']
-    pv_te.to_csv(out / 'pv_test.csv')
-    trades_te.to_csv(out / 'trades_test.csv', index=False)
-
-    # Benchmark PV aligned (normalize to same initial capital)
-    ibov_tr_pv = (ibov_tr / ibov_tr.iloc[0]) * config.INITIAL_CASH
-    ibov_te_pv = (ibov_te / ibov_te.iloc[0]) * config.INITIAL_CASH
+        for line in ga['log']:
+            f.write(f'{line}\n')
+    return ga
 
-    # Export stats + plots for train and test
-    export_stats_and_plots(pv_tr, ibov_tr_pv, trades_tr, out)
-    export_stats_and_plots(pv_te, ibov_te_pv, trades_te, out)
+def load_weights(path=None) -> dict:
+    return json.loads((config.OUT_DIR / 'chosen_weights.json' if path is None else path).read_text())
+
+def backtest(pipe, px, tensor, weights, name):
+    # writes pv_<name>.csv and trades_<name>.csv
+    def run():
+        from indicators import score_from_weights
+        from backtest import run_backtest
+        res = run_backtest(px, score_from_weights(tensor, weights), config.TOP_N)
+        return res['pv'], res['trades']
+    out = config.OUT_DIR
+    pv, trades = pipe.run(f'backtest_{name}', run, deps=[f'indicators_{name}'], fields=STRATEGY_FIELDS,
+                          code=BACKTEST_CODE, extra={'weights': weights})
+    pv.to_csv(out / f'pv_{name}.csv')
+    trades.to_csv(out / f'trades_{name}.csv', index=False)
+    return pv, trades
+
+def load_backtest(name):
+    import pandas as pd
+    out = config.OUT_DIR
+    pv = pd.read_csv(out / f'pv_{name}.csv', index_col=0, parse_dates=True).iloc[:, 0]
+    try:
+        trades = pd.read_csv(out / f'trades_{name}.csv', parse_dates=['date'])
+    except pd.errors.EmptyDataError:
+        trades = pd.DataFrame()
+    return pv, trades
 
-    # Save combined stats CSVs
+def report(results: dict, ibov):
+    # results: {split name: (pv, trades)}
     import pandas as pd
+    from reporting import export_stats_and_plots
     from utils import stats_from_pv
-    train_stats = stats_from_pv(pv_tr, len(trades_tr))
-    test_stats  = stats_from_pv(pv_te, len(trades_te))
-    pd.Series(train_stats).to_csv(out / 'strategy_stats_train.csv', header=False)
-    pd.Series(test_stats).to_csv(out / 'strategy_stats_test.csv', header=False)
+    out = config.OUT_DIR
+    for name, (pv, trades) in results.items():
+        ib = ibov.loc[pv.index.min():pv.index.max()]
+        # Benchmark PV aligned (normalize to same initial capital)
+        ib_pv = (ib / ib.iloc[0]) * config.INITIAL_CASH
+        export_stats_and_plots(pv, ib_pv, trades, out)
+        pd.Series(stats_from_pv(pv, len(trades))).to_csv(out / f'strategy_stats_{name}.csv', header=False)
+
+def main():
+    out = config.OUT_DIR
+    pipe = Pipeline()
+
+    # Load, clean & align
+    prices, ibov = load_panel(pipe)
+
+    # Split
+    tr, _ = split(prices, ibov, 'train')
+    te, _ = split(prices, ibov, 'test')
+
+    # Indicators (rebalance dates only) per split
+    tensor_tr = indicator_tensor(pipe, tr, 'train')
+    tensor_te = indicator_tensor(pipe, te, 'test')
+
+    # GA optimize on training
+    best_w = optimize(pipe, tr, tensor_tr)['weights']
+
+    # Backtest train and test
+    results = {
+        'train': backtest(pipe, tr, tensor_tr, best_w, 'train'),
+        'test': backtest(pipe, te, tensor_te, best_w, 'test'),
+    }
+
+    # Export stats + plots for train and test
+    report(results, ibov)
+
+    import profiling
+    if profiling.enabled():
+        profiling.span_report().to_csv(out / 'profile_spans.csv')
 
+    if pipe.loaded:
+        print('Reused stages:', ', '.join(pipe.loaded))
     print('Done. Outputs in:', out)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
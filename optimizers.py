@@ -0,0 +1,186 @@
+import numpy as np
+import pandas as pd
+import config
+from indicators import INDICATOR_NAMES, ZScoreTensor
+from backtest import monthly_rebalance_dates
+from fitness_cache import FitnessCache, strategy_params
+from parallel import FitnessExecutor, share_panel
+from genetic_algorithm import _fitness_chunk, _normalize, _weights_to_dict, optimize_weights
+
+# Alternatives to the GA behind one ask/tell interface: `ask()` returns the
+# next population as a (candidates x indicators) array of simplex weights,
+# `tell(pop, fitness)` updates the search state from their fitness.
+
+def _softmax(x: np.ndarray) -> np.ndarray:
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+def _project(x: np.ndarray) -> np.ndarray:
+    # _normalize for every row: clip at 0 and rescale, uniform if all zero
+    x = np.clip(x, 0.0, None)
+    s = x.sum(axis=1, keepdims=True)
+    return np.where(s > 0, x / np.where(s > 0, s, 1.0), 1.0 / x.shape[1])
+
+class CMAES:
+    """(mu/mu_w, lambda)-CMA-ES maximizing fitness; candidates are the softmax of
+    Gaussian samples, so the search runs unconstrained and lands on the simplex."""
+
+    def __init__(self, dim: int, seed: int, pop_size: int = None, sigma0: float = None):
+        self.rng = np.random.default_rng(seed)
+        self.n = n = dim
+        self.lam = int(pop_size or 4 + int(3 * np.log(n)))
+        self.mu = self.lam // 2
+        w = np.log((self.lam + 1) / 2) - np.log(np.arange(1, self.mu + 1))
+        self.w = w / w.sum()
+        self.mueff = 1.0 / (self.w ** 2).sum()
+        self.cc = (4 + self.mueff / n) / (n + 4 + 2 * self.mueff / n)
+        self.cs = (self.mueff + 2) / (n + self.mueff + 5)
+        self.c1 = 2 / ((n + 1.3) ** 2 + self.mueff)
+        self.cmu = min(1 - self.c1, 2 * (self.mueff - 2 + 1 / self.mueff) / ((n + 2) ** 2 + self.mueff))
+        self.damps = 1 + 2 * max(0.0, np.sqrt((self.mueff - 1) / (n + 1)) - 1) + self.cs
+        self.chi_n = np.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n * n))
+        self.mean = np.zeros(n)
+        self.sigma = float(config.CMA_SIGMA0 if sigma0 is None else sigma0)
+        self.C = np.eye(n)
+        self.pc = np.zeros(n)
+        self.ps = np.zeros(n)
+        self.gen = 0
+        self._z = None
+
+    def ask(self) -> np.ndarray:
+        vals, vecs = np.linalg.eigh(self.C)
+        self._B, self._D = vecs, np.sqrt(np.clip(vals, 1e-20, None))
+        self._z = self.rng.standard_normal((self.lam, self.n))
+        self._x = self.mean + self.sigma * (self._z * self._D) @ self._B.T
+        return _softmax(self._x)
+
+    def tell(self, pop: np.ndarray, fitness) -> None:
+        order = np.argsort(-np.asarray(fitness), kind='stable')[:self.mu]
+        old = self.mean
+        self.mean = self.w @ self._x[order]
+        y = (self.mean - old) / self.sigma
+        c_inv_sqrt = self._B @ np.diag(1 / self._D) @ self._B.T
+        self.ps = (1 - self.cs) * self.ps + np.sqrt(self.cs * (2 - self.cs) * self.mueff) * c_inv_sqrt @ y
+        self.gen += 1
+        hsig = np.linalg.norm(self.ps) / np.sqrt(1 - (1 - self.cs) ** (2 * self.gen)) / self.chi_n < 1.4 + 2 / (self.n + 1)
+        self.pc = (1 - self.cc) * self.pc + hsig * np.sqrt(self.cc * (2 - self.cc) * self.mueff) * y
+        steps = (self._x[order] - old) / self.sigma
+        self.C = ((1 - self.c1 - self.cmu) * self.C
+                  + self.c1 * (np.outer(self.pc, self.pc) + (not hsig) * self.cc * (2 - self.cc) * self.C)
+                  + self.cmu * (steps.T * self.w) @ steps)
+        self.sigma *= np.exp((self.cs / self.damps) * (np.linalg.norm(self.ps) / self.chi_n - 1))
+
+class DifferentialEvolution:
+    """DE/rand/1/bin on the simplex: mutants are projected back with _normalize
+    and a trial replaces its parent when its fitness is at least as good."""
+
+    def __init__(self, dim: int, seed: int, pop_size: int = None, f: float = None, cr: float = None):
+        self.rng = np.random.default_rng(seed)
+        self.np_ = int(pop_size or 10 * dim)
+        self.f = float(config.DE_F if f is None else f)
+        self.cr = float(config.DE_CR if cr is None else cr)
+        self.pop = _project(self.rng.random((self.np_, dim)))
+        self.fit = None
+
+    def ask(self) -> np.ndarray:
+        if self.fit is None:
+            return self.pop
+        n, dim = self.pop.shape
+        # three distinct donors per target, none equal to the target
+        r = np.argsort(self.rng.random((n, n - 1)), axis=1)[:, :3]
+        r += r >= np.arange(n)[:, None]
+        mutant = self.pop[r[:, 0]] + self.f * (self.pop[r[:, 1]] - self.pop[r[:, 2]])
+        cross = self.rng.random((n, dim)) < self.cr
+        cross[np.arange(n), self.rng.integers(0, dim, n)] = True
+        return _project(np.where(cross, mutant, self.pop))
+
+    def tell(self, pop: np.ndarray, fitness) -> None:
+        fitness = np.asarray(fitness, dtype=float)
+        if self.fit is None:
+            self.pop, self.fit = pop.copy(), fitness
+            return
+        better = fitness >= self.fit
+        self.pop[better] = pop[better]
+        self.fit = np.where(better, fitness, self.fit)
+
+OPTIMIZERS = {'cmaes': CMAES, 'de': DifferentialEvolution}
+
+def optimize(name: str, prices_train: pd.DataFrame, top_n: int, seed: int, budget: int = None,
+             pop_size: int = None, tensor: ZScoreTensor = None, cache: FitnessCache = None):
+    """Maximize training CAGR with optimizer `name` ('ga', 'cmaes' or 'de')
+    until `budget` full-length backtests have run (cache hits are free; the
+    last generation may overshoot). A converged search that only revisits
+    cached candidates stops after OPT_STALL generations without a new one.
+
+    Returns (weights dict, best fitness, curve), where curve has one row per
+    generation: gen, evaluations so far and best fitness so far.
+    """
+    budget = int(budget or config.OPT_BUDGET)
+    if tensor is None:
+        tensor = ZScoreTensor.from_prices(prices_train, dates=monthly_rebalance_dates(prices_train.index, config.REB_FREQ))
+    if cache is None:
+        cache = FitnessCache(prices_train, strategy_params(top_n), tensor=tensor)
+    # one population size for all optimizers keeps their curves on the same evaluation grid
+    pop_size = int(pop_size or config.GA_POP_SIZE)
+    history = []
+    if name == 'ga':
+        # elites come back as cache hits, so run generations until the misses reach the budget;
+        # every generation costs at most pop_size and stalls are capped like the others
+        weights, best_fit = optimize_weights(
+            prices_train, top_n, seed, pop_size, budget, config.GA_CROSSOVER_RATE,
+            config.GA_MUTATION_RATE, config.GA_ELITISM, tensor=tensor, cache=cache, history=history,
+            max_evaluations=budget, max_stall=config.OPT_STALL)
+        return weights, best_fit, pd.DataFrame(history)
+    if name not in OPTIMIZERS:
+        raise ValueError(f'Unknown optimizer: {name!r}; choose from ga, {", ".join(OPTIMIZERS)}')
+
+    opt = OPTIMIZERS[name](len(INDICATOR_NAMES), seed, pop_size)
+    arrays, ctx = share_panel(prices_train, tensor)
+    ctx['top_n'] = top_n
+    misses0 = cache.stats()['misses']
+    best_w, best_fit = None, -1e9
+    with FitnessExecutor(_fitness_chunk, arrays, ctx) as executor:
+        gen, stall, misses = 0, 0, 0
+        while misses < budget and stall < config.OPT_STALL:
+            pop = opt.ask()
+            fitness = cache.evaluate(list(pop), executor.map)
+            opt.tell(pop, fitness)
+            idx = int(np.argmax(fitness))
+            if fitness[idx] > best_fit:
+                best_fit, best_w = float(fitness[idx]), pop[idx].copy()
+            new = cache.stats()['misses'] - misses0 - misses
+            misses += new
+            stall = 0 if new else stall + 1
+            history.append({'gen': gen, 'evaluations': misses, 'best': best_fit})
+            gen += 1
+    return _weights_to_dict(_normalize(best_w)), best_fit, pd.DataFrame(history)
+
+def compare(prices_train: pd.DataFrame, top_n: int = None, seeds=(0,), names=('ga', 'cmaes', 'de'),
+            budget: int = None, tensor: ZScoreTensor = None) -> pd.DataFrame:
+    # fitness-vs-evaluation curves of several optimizers on the same budget
+    top_n = top_n or config.TOP_N
+    if tensor is None:
+        tensor = ZScoreTensor.from_prices(prices_train, dates=monthly_rebalance_dates(prices_train.index, config.REB_FREQ))
+    curves = []
+    for name in names:
+        for seed in seeds:
+            _, _, curve = optimize(name, prices_train, top_n, seed, budget, tensor=tensor)
+            curves.append(curve.assign(optimizer=name, seed=seed))
+    return pd.concat(curves, ignore_index=True)
+
+def main():
+    # same aligned training split and tensor as the pipeline's GA stage
+    from main import load_panel, split, indicator_tensor
+    from pipeline import Pipeline
+    out = config.OUT_DIR
+    pipe = Pipeline()
+    prices, ibov = load_panel(pipe)
+    tr, _ = split(prices, ibov, 'train')
+    curves = compare(tr, seeds=range(3), tensor=indicator_tensor(pipe, tr, 'train'))
+    curves.to_csv(out / 'optimizer_curves.csv', index=False)
+    final = curves.groupby(['optimizer', 'seed']).last()
+    print(final.groupby('optimizer')[['evaluations', 'best']].mean())
+    print('Done. Outputs in:', out)
+
+if __name__ == '__main__':
+    main()
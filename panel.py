@@ -0,0 +1,38 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import config
+
+def panel_dtype() -> np.dtype:
+    return np.dtype(config.PANEL_DTYPE)
+
+def as_panel(df: pd.DataFrame, name: str = 'panel') -> pd.DataFrame:
+    """Cast a dates x tickers panel to PANEL_DTYPE, memory-mapped under PANEL_MEMMAP_DIR if set.
+
+    With the defaults (float64, no memmap dir) the input is returned as is.
+    Memory-mapped files are named by `name` and a hash of the content, so
+    reruns reuse them instead of piling up new ones, and a file is only ever
+    created whole (temp file + rename), never rewritten while mapped. The
+    mapping is copy-on-write: edits to the frame never reach the file.
+    """
+    dtype = panel_dtype()
+    if config.PANEL_MEMMAP_DIR is None:
+        if (df.dtypes == dtype).all():
+            return df
+        return df.astype(dtype)
+    directory = Path(config.PANEL_MEMMAP_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    values = np.ascontiguousarray(df.to_numpy(dtype=dtype))
+    h = hashlib.sha256(values.tobytes())
+    h.update(pd.util.hash_pandas_object(df.index).to_numpy().tobytes())
+    h.update(pd.util.hash_pandas_object(pd.Series(df.columns.astype(str))).to_numpy().tobytes())
+    path = directory / f'{name}-{dtype.name}-{h.hexdigest()[:16]}.npy'
+    if not path.exists():
+        with tempfile.NamedTemporaryFile(dir=directory, prefix=f'{name}-', suffix='.tmp', delete=False) as f:
+            np.save(f, values)
+        os.replace(f.name, path)
+    mm = np.load(path, mmap_mode='c')
+    return pd.DataFrame(mm, index=df.index, columns=df.columns, copy=False)
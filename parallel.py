@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+import config
+from indicators import ZScoreTensor
+
+# config fields a worker process needs to evaluate fitness or run a whole GA;
+# shipped to process workers (here, walkforward.py, experiments.py) so runtime
+# overrides survive the 'spawn' start method
+CONFIG_FIELDS = ['INITIAL_CASH', 'SLIPPAGE_BPS', 'TOP_N', 'FIXED_STOP_LOSS', 'TRAILING_STOP', 'REB_FREQ',
+                 'BACKTEST_ENGINE', 'GA_BATCH_EVAL', 'INDICATOR_ENGINE', 'PANEL_DTYPE', 'PANEL_MEMMAP_DIR',
+                 'GA_SEED', 'GA_POP_SIZE', 'GA_GENERATIONS', 'GA_CROSSOVER_RATE', 'GA_MUTATION_RATE', 'GA_ELITISM',
+                 'GA_EXECUTOR', 'GA_WORKERS', 'GA_CACHE_SIZE', 'GA_CACHE_TOL', 'GA_CACHE_PERSIST', 'GA_CACHE_DIR',
+                 'GA_SUCCESSIVE_HALVING', 'GA_SH_RUNGS', 'GA_SH_KEEP',
+                 'GA_EARLY_STOP', 'GA_PATIENCE', 'GA_MIN_DELTA', 'GA_DIVERSITY_FLOOR']
+
+def worker_config() -> dict:
+    return {key: getattr(config, key) for key in CONFIG_FIELDS}
+
+_WORKER = {}
+
+def share_panel(prices: pd.DataFrame, tensor: ZScoreTensor):
+    arrays = {
+        'px': prices.to_numpy(dtype=float),
+        'z': tensor.values,
+        'empty': tensor._empty,
+    }
+    ctx = {
+        'index': prices.index,
+        'columns': prices.columns,
+        'z_index': tensor.index,
+        'z_columns': tensor.columns,
+        'names': tensor.names,
+    }
+    return arrays, ctx
+
+def panel_views(arrays: dict, ctx: dict):
+    prices = pd.DataFrame(arrays['px'], index=ctx['index'], columns=ctx['columns'], copy=False)
+    tensor = ZScoreTensor.from_arrays(ctx['names'], ctx['z_index'], ctx['z_columns'], arrays['z'], arrays['empty'])
+    return prices, tensor
+
+def _publish(arrays: dict):
+    blocks, spec = [], {}
+    for name, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+        blocks.append(shm)
+        spec[name] = (shm.name, arr.shape, arr.dtype.str)
+    return blocks, spec
+
+def _attach(spec: dict):
+    blocks, arrays = [], {}
+    for name, (shm_name, shape, dtype) in spec.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        blocks.append(shm)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    return blocks, arrays
+
+def _init_worker(fn, spec, ctx, cfg):
+    for key, value in cfg.items():
+        setattr(config, key, value)
+    blocks, arrays = _attach(spec)
+    _WORKER.update(fn=fn, blocks=blocks, arrays=arrays, ctx=ctx)
+
+def _run_chunk(weights):
+    return _WORKER['fn'](weights, _WORKER['arrays'], _WORKER['ctx'])
+
+class FitnessExecutor:
+    """Evaluate a population with `fn(weights_chunk, arrays, ctx) -> list of fitness`.
+
+    mode is 'serial', 'thread' or 'process'. In process mode `arrays` are
+    published once through shared memory and each worker attaches to them in
+    its initializer; only weight chunks travel per task. Chunks are returned
+    in order, so results do not depend on the mode or worker count.
+    """
+
+    def __init__(self, fn, arrays: dict, ctx: dict, mode: str = None, workers: int = None):
+        self.fn = fn
+        self.arrays = arrays
+        self.ctx = ctx
+        self.mode = mode or config.GA_EXECUTOR
+        self.workers = max(1, int(workers or config.GA_WORKERS))
+        self._pool = None
+        self._blocks = []
+        if self.mode == 'thread':
+            self._pool = ThreadPoolExecutor(max_workers=self.workers)
+        elif self.mode == 'process':
+            self._blocks, spec = _publish(arrays)
+            cfg = worker_config()
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=(fn, spec, ctx, cfg))
+        elif self.mode != 'serial':
+            raise ValueError(f'Unknown executor mode: {self.mode!r}')
+
+    def map(self, pop) -> list:
+        weights = np.stack(pop)
+        if self._pool is None:
+            return list(self.fn(weights, self.arrays, self.ctx))
+        chunks = np.array_split(weights, min(self.workers, len(weights)))
+        if self.mode == 'thread':
+            results = self._pool.map(lambda chunk: self.fn(chunk, self.arrays, self.ctx), chunks)
+        else:
+            results = self._pool.map(_run_chunk, chunks)
+        return [float(f) for chunk in results for f in chunk]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        for shm in self._blocks:
+            shm.close()
+            shm.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+import config
+
+# bump to invalidate every stored artifact at once
+_STAGE_VERSION = 1
+
+def source_fingerprint(path) -> dict:
+    # cheap identity of an input file; data.py rehashes content for its own cache
+    path = Path(path)
+    st = path.stat()
+    return {'path': str(path), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+def code_fingerprint(modules) -> str:
+    h = hashlib.sha256()
+    root = Path(__file__).parent
+    for name in sorted(modules):
+        h.update(name.encode())
+        h.update((root / f'{name}.py').read_bytes())
+    return h.hexdigest()
+
+def atomic_dump(obj, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+    with open(tmp, 'wb') as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+class Pipeline:
+    """On-disk artifact cache for the stages of main.py.
+
+    A stage's key hashes its name, the keys of the stages it depends on, the
+    config fields it reads, the source of the modules that compute it and any
+    extra inputs. A stage whose key already has an artifact under `directory`
+    is loaded instead of recomputed, so a rerun only executes the stages an
+    edit invalidated. Long stages can keep progress under `checkpoint(name)`.
+    Saving a stage's result removes its checkpoint and the artifacts of the
+    keys it superseded, so the directory holds one version per stage.
+    """
+
+    def __init__(self, directory=None, enabled: bool = None):
+        self.directory = Path(config.STAGE_DIR if directory is None else directory)
+        self.enabled = config.STAGE_CACHE if enabled is None else bool(enabled)
+        self.keys = {}
+        self.ran = []
+        self.loaded = []
+
+    def key(self, name: str, deps=(), fields=(), code=(), extra=None) -> str:
+        payload = {
+            'version': _STAGE_VERSION,
+            'stage': name,
+            'deps': [self.keys[d] for d in deps],
+            'config': {f: getattr(config, f) for f in fields},
+            'code': code_fingerprint(code),
+            'extra': extra,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def path(self, name: str) -> Path:
+        return self.directory / f'{name}-{self.keys[name][:16]}.pkl'
+
+    def checkpoint(self, name: str) -> Path:
+        return self.directory / f'{name}-{self.keys[name][:16]}.ckpt'
+
+    def declare(self, name: str, deps=(), fields=(), code=(), extra=None) -> bool:
+        # register a stage's key without running or loading it, so later
+        # stages can depend on it; True when its artifact is on disk
+        self.keys[name] = self.key(name, deps, fields, code, extra)
+        return self.enabled and self.path(name).exists()
+
+    def run(self, name: str, fn, deps=(), fields=(), code=(), extra=None):
+        self.keys[name] = self.key(name, deps, fields, code, extra)
+        path = self.path(name)
+        if self.enabled and path.exists():
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            self.loaded.append(name)
+            return value
+        value = fn()
+        if self.enabled:
+            atomic_dump(value, path)
+            self.prune(name)
+        self.ran.append(name)
+        return value
+
+    def prune(self, name: str):
+        # everything of stage `name` but its current artifact: its checkpoint and superseded keys
+        current = self.path(name)
+        for old in self.directory.glob(f'{name}-*'):
+            stem, _, suffix = old.name.rpartition('.')
+            key = stem[len(name) + 1:]
+            if old != current and suffix in ('pkl', 'ckpt') and len(key) == 16 and '.' not in key:
+                old.unlink(missing_ok=True)
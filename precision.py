@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import config, data
+from indicators import ZScoreTensor, compute_indicators, score_from_weights
+from backtest import run_backtest, rebalance_rows, pick_matrix
+from utils import stats_from_pv
+from profiling import stage_memory, memory_report
+
+def _run(raw_prices: pd.DataFrame, weights: dict, top_n: int, dtype: str) -> dict:
+    saved = config.PANEL_DTYPE
+    config.PANEL_DTYPE = dtype
+    try:
+        memory_report(reset=True)
+        with stage_memory('clean_prices'):
+            prices = data.clean_prices(raw_prices)
+        with stage_memory('compute_indicators'):
+            indicators = compute_indicators(prices)
+        with stage_memory('zscore_tensor'):
+            tensor = ZScoreTensor(indicators)
+        with stage_memory('score_from_weights'):
+            score = score_from_weights(tensor, weights)
+        with stage_memory('run_backtest'):
+            res = run_backtest(prices, score, top_n)
+        return {
+            'score': score,
+            'pv': res['pv'],
+            'stats': stats_from_pv(res['pv'], len(res['trades'])),
+            'memory_mb': memory_report(reset=True),
+        }
+    finally:
+        config.PANEL_DTYPE = saved
+
+def compare_precision(raw_prices: pd.DataFrame, weights: dict, top_n: int = None,
+                      dtype: str = 'float32', score_atol: float = 1e-3,
+                      min_pick_overlap: float = 0.95, stat_atol: float = 0.01) -> dict:
+    """Run the pipeline in float64 and in `dtype` and report drift and peak memory per stage.
+
+    Scores are compared element-wise; rankings as the mean overlap of the
+    top-N picks on rebalance dates; stats as absolute differences.
+    `within_tolerance` is False if any check fails.
+    """
+    top_n = config.TOP_N if top_n is None else top_n
+    ref = _run(raw_prices, weights, top_n, 'float64')
+    low = _run(raw_prices, weights, top_n, dtype)
+
+    a = ref['score'].to_numpy(dtype=float)
+    b = low['score'].reindex_like(ref['score']).to_numpy(dtype=float)
+    both = ~np.isnan(a) & ~np.isnan(b)
+    score_err = float(np.abs(a[both] - b[both]).max()) if both.any() else 0.0
+    nan_mismatch = int((np.isnan(a) != np.isnan(b)).sum())
+
+    overlaps = []
+    reb = rebalance_rows(ref['score'].index)
+    for pa, pb in zip(pick_matrix(a[reb], top_n), pick_matrix(b[reb], top_n)):
+        pa, pb = pa[pa >= 0], pb[pb >= 0]
+        if len(pa):
+            overlaps.append(len(np.intersect1d(pa, pb)) / len(pa))
+    pick_overlap = float(np.mean(overlaps)) if overlaps else 1.0
+
+    stat_diff = {k: abs(float(low['stats'][k]) - float(ref['stats'][k])) for k in ref['stats']}
+    stats_ok = all(np.isnan(v) or v <= stat_atol for k, v in stat_diff.items() if k != 'NumTrades')
+
+    memory = pd.DataFrame({'float64': ref['memory_mb'], dtype: low['memory_mb']})
+    return {
+        'score_max_abs_err': score_err,
+        'score_nan_mismatch': nan_mismatch,
+        'pick_overlap': pick_overlap,
+        'stat_abs_diff': stat_diff,
+        'memory_mb': memory,
+        'within_tolerance': bool(score_err <= score_atol and nan_mismatch == 0
+                                 and pick_overlap >= min_pick_overlap and stats_ok),
+    }
@@ -0,0 +1,94 @@
+import functools
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+import pandas as pd
+import config
+
+_MEMORY_PEAKS = {}
+
+@contextmanager
+def stage_memory(name: str):
+    # Peak Python/NumPy heap growth (bytes) while the block runs. Stages must
+    # not be nested: each one resets the tracemalloc peak. Memory-mapped
+    # pages are not heap and are not counted.
+    owner = not tracemalloc.is_tracing()
+    if owner:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    try:
+        yield
+    finally:
+        _MEMORY_PEAKS[name] = tracemalloc.get_traced_memory()[1] - base
+        if owner:
+            tracemalloc.stop()
+
+def memory_report(reset: bool = False) -> dict:
+    out = {name: peak / 2**20 for name, peak in _MEMORY_PEAKS.items()}
+    if reset:
+        _MEMORY_PEAKS.clear()
+    return out
+
+# Timing spans and GA telemetry. Everything below is gated on config.PROFILE
+# and costs one attribute check per call when it is off.
+
+_SPANS = {}
+_SPAN_LOCK = threading.Lock()
+_NULL = nullcontext()
+
+def enabled() -> bool:
+    return bool(config.PROFILE)
+
+class _Span:
+    __slots__ = ('name', 't0')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        dt = time.perf_counter() - self.t0
+        with _SPAN_LOCK:
+            stat = _SPANS.setdefault(self.name, [0, 0.0])
+            stat[0] += 1
+            stat[1] += dt
+
+def span(name: str):
+    return _Span(name) if config.PROFILE else _NULL
+
+def timed(name: str):
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not config.PROFILE:
+                return fn(*args, **kwargs)
+            with _Span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+def span_totals() -> dict:
+    # total seconds per span name in this process; spans recorded inside
+    # process-pool workers are not visible here
+    with _SPAN_LOCK:
+        return {name: stat[1] for name, stat in _SPANS.items()}
+
+def span_report(reset: bool = False) -> pd.DataFrame:
+    with _SPAN_LOCK:
+        rows = {name: {'count': n, 'total_s': t, 'mean_s': t / n} for name, (n, t) in _SPANS.items()}
+        if reset:
+            _SPANS.clear()
+    return pd.DataFrame(rows).T.sort_values('total_s', ascending=False) if rows else pd.DataFrame()
+
+def emit(record: dict, path=None):
+    path = Path(path or config.TELEMETRY_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'a') as f:
+        f.write(json.dumps(record, default=float) + '\n')
@@ -1,14 +1,19 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-from utils import stats_from_pv, drawdown_series
+import config
+from utils import stats_from_pv, drawdown_series, rolling_drawdown, rolling_sharpe
 
 def export_stats_and_plots(strategy_pv, ibov_pv, trades_df, out_dir):
+    import matplotlib.pyplot as plt  # deferred: by far the slowest import in the project
     # Stats
     strat_stats = stats_from_pv(strategy_pv, len(trades_df))
     bench_trades = 0
     bench_stats = stats_from_pv(ibov_pv, bench_trades)
     pd.Series(strat_stats).to_csv(out_dir / 'strategy_stats.csv', header=False)
     pd.Series(bench_stats).to_csv(out_dir / 'ibov_stats.csv', header=False)
+    if config.ROBUSTNESS:
+        from robustness import robustness_report
+        robustness_report(strategy_pv, trades_df).to_csv(out_dir / 'strategy_stats_intervals.csv')
+        robustness_report(ibov_pv).to_csv(out_dir / 'ibov_stats_intervals.csv')
 
     # Curves chart
     plt.figure()
@@ -29,4 +34,23 @@ def export_stats_and_plots(strategy_pv, ibov_pv, trades_df, out_dir):
     plt.xlabel('Data'); plt.ylabel('Drawdown')
     plt.tight_layout()
     plt.savefig(out_dir / 'drawdown_strategy.png')
+    plt.close()
+
+    # Rolling Sharpe / drawdown, strategy and IBOV in one pass
+    curves = pd.concat([strategy_pv, ibov_pv], axis=1, keys=['strategy', 'ibov'])
+    pv = curves.to_numpy(dtype=float).T
+    window = config.ROLLING_WINDOW
+    rolling = pd.concat([
+        pd.DataFrame(rolling_sharpe(pv, window).T, index=curves.index, columns=curves.columns).add_suffix('_sharpe'),
+        pd.DataFrame(rolling_drawdown(pv, window).T, index=curves.index, columns=curves.columns).add_suffix('_drawdown'),
+    ], axis=1)
+    rolling.to_csv(out_dir / 'rolling_metrics.csv')
+
+    plt.figure()
+    rolling[['strategy_sharpe', 'ibov_sharpe']].plot(ax=plt.gca())
+    plt.title(f'Sharpe móvel ({window}d) — Estratégia vs IBOV')
+    plt.xlabel('Data'); plt.ylabel('Sharpe')
+    plt.legend(['Estratégia', 'IBOV'])
+    plt.tight_layout()
+    plt.savefig(out_dir / 'rolling_sharpe.png')
     plt.close()
\ No newline at end of file
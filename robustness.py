@@ -0,0 +1,116 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import config
+from utils import STAT_NAMES as METRICS, pv_stats, stats_from_pv
+# resamples per task; fixed so results do not depend on the worker count
+_CHUNK = 256
+
+def stationary_bootstrap(n: int, n_samples: int, mean_block: float, rng) -> np.ndarray:
+    """(n_samples, n) row indices of Politis-Romano stationary bootstrap resamples.
+
+    Blocks start at uniform positions, have geometric lengths with mean
+    `mean_block` and wrap around the end of the series.
+    """
+    starts = rng.integers(0, n, size=(n_samples, n))
+    new = rng.random((n_samples, n)) < 1.0 / mean_block
+    new[:, 0] = True
+    t = np.arange(n)
+    first = np.maximum.accumulate(np.where(new, t, 0), axis=1)
+    return (np.take_along_axis(starts, first, axis=1) + t - first) % n
+
+def return_metrics(rets: np.ndarray) -> np.ndarray:
+    # utils.stats_from_pv for every row of a (samples x days) return matrix,
+    # with the PV starting at 1 the day before the first return
+    pv = np.hstack([np.ones((len(rets), 1)), np.cumprod(1.0 + rets, axis=1)])
+    stats = pv_stats(pv)
+    return np.column_stack([stats[k] for k in METRICS])
+
+def trade_pnl(trades: pd.DataFrame) -> np.ndarray:
+    # realized P&L of each round trip (BUY then SELL of a ticker), by exit order
+    if trades.empty:
+        return np.empty(0)
+    buy_cost = 1 + config.SLIPPAGE_BPS/10000.0
+    sell_net = 1 - config.SLIPPAGE_BPS/10000.0
+    out = []
+    for _, g in trades.groupby('ticker', sort=False):
+        buys = g[g['side'] == 'BUY']
+        sells = g[g['side'] == 'SELL']
+        m = min(len(buys), len(sells))
+        pnl = sells['shares'].to_numpy()[:m] * (sells['price'].to_numpy()[:m] * sell_net
+                                                - buys['price'].to_numpy()[:m] * buy_cost)
+        out.append(pd.Series(pnl, index=sells.index[:m]))
+    return pd.concat(out).sort_index().to_numpy(dtype=float) if out else np.empty(0)
+
+def _pnl_metrics(pnl: np.ndarray) -> np.ndarray:
+    # max drawdown and longest losing streak of each (samples x trades) P&L sequence
+    equity = config.INITIAL_CASH + np.cumsum(pnl, axis=1)
+    peak = np.maximum(np.maximum.accumulate(equity, axis=1), config.INITIAL_CASH)
+    maxdd = np.minimum((equity / peak - 1.0).min(axis=1), 0.0)
+    loss = pnl < 0
+    t = np.arange(pnl.shape[1])
+    last_win = np.maximum.accumulate(np.where(loss, -1, t), axis=1)
+    streak = np.where(loss, t - last_win, 0).max(axis=1)
+    return np.column_stack([maxdd, streak])
+
+def _block_chunk(rets, n_samples, mean_block, seed):
+    rng = np.random.default_rng(seed)
+    return return_metrics(rets[stationary_bootstrap(len(rets), n_samples, mean_block, rng)])
+
+def _shuffle_chunk(pnl, n_samples, seed):
+    rng = np.random.default_rng(seed)
+    return _pnl_metrics(rng.permuted(np.broadcast_to(pnl, (n_samples, len(pnl))), axis=1))
+
+def _run(fn, args, n_samples, seed, workers):
+    sizes = [min(_CHUNK, n_samples - s) for s in range(0, n_samples, _CHUNK)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(*args, size, s) for size, s in zip(sizes, seeds)]
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            parts = list(pool.map(fn, *zip(*tasks)))
+    else:
+        parts = [fn(*t) for t in tasks]
+    return np.vstack(parts)
+
+def bootstrap_metrics(series: pd.Series, returns: bool = False, n_samples: int = None,
+                      mean_block: float = None, seed: int = None, workers: int = None) -> pd.DataFrame:
+    """Distribution of the stats_from_pv metrics over stationary block-bootstrap resamples."""
+    rets = np.asarray(series if returns else series.pct_change().dropna(), dtype=float)
+    rets = rets[~np.isnan(rets)]
+    dist = _run(_block_chunk, (rets, config.ROBUST_BLOCK if mean_block is None else mean_block),
+                config.ROBUST_SAMPLES if n_samples is None else n_samples,
+                config.ROBUST_SEED if seed is None else seed,
+                config.ROBUST_WORKERS if workers is None else workers)
+    return pd.DataFrame(dist, columns=METRICS)
+
+def shuffle_trades(trades: pd.DataFrame, n_samples: int = None, seed: int = None, workers: int = None) -> pd.DataFrame:
+    """Max drawdown and longest losing streak of the closed-trade P&L over random trade orders."""
+    pnl = trade_pnl(trades)
+    dist = _run(_shuffle_chunk, (pnl,),
+                config.ROBUST_SAMPLES if n_samples is None else n_samples,
+                config.ROBUST_SEED if seed is None else seed,
+                config.ROBUST_WORKERS if workers is None else workers)
+    return pd.DataFrame(dist, columns=['TradeMaxDD', 'MaxLosingStreak'])
+
+def intervals(dist: pd.DataFrame, point: dict = None, level: float = None) -> pd.DataFrame:
+    # one row per metric: point estimate, bootstrap mean and the central interval
+    level = config.ROBUST_LEVEL if level is None else level
+    lo, hi = (1 - level) / 2, (1 + level) / 2
+    table = pd.DataFrame({
+        'mean': dist.mean(),
+        f'p{lo*100:g}': dist.quantile(lo),
+        'p50': dist.quantile(0.5),
+        f'p{hi*100:g}': dist.quantile(hi),
+    })
+    if point is not None:
+        table.insert(0, 'point', pd.Series(point).reindex(table.index))
+    return table
+
+def robustness_report(pv: pd.Series, trades: pd.DataFrame = None) -> pd.DataFrame:
+    point = stats_from_pv(pv, 0 if trades is None else len(trades))
+    tables = [intervals(bootstrap_metrics(pv), point)]
+    if trades is not None and not trades.empty:
+        pnl = trade_pnl(trades)
+        sequence = _pnl_metrics(pnl[None, :])[0] if len(pnl) else [np.nan, np.nan]
+        tables.append(intervals(shuffle_trades(trades), dict(zip(['TradeMaxDD', 'MaxLosingStreak'], sequence))))
+    return pd.concat(tables)
@@ -0,0 +1,294 @@
+import asyncio
+import json
+import math
+import pickle
+import sys
+import time
+from io import StringIO
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import config
+from incremental import IncrementalIndicators
+from backtest import pick_matrix
+from fitness_cache import strategy_params
+from pipeline import Pipeline, atomic_dump, source_fingerprint
+
+def is_rebalance_day(ts) -> bool:
+    # a bar is a rebalance day when it falls on a REB_FREQ anchor, which is
+    # what intersecting the calendar with the trading index selects in backtest
+    ts = pd.Timestamp(ts)
+    return len(pd.date_range(ts, ts, freq=config.REB_FREQ)) > 0
+
+class SignalState:
+    """In-memory state of the daily signal service.
+
+    Incremental indicators plus the book of run_backtest_pandas: positions in
+    insertion order, cash, entry prices and running peaks. `step` applies one
+    bar with the backtest's rules (stops, then the rebalance on rebalance
+    days, then mark-to-market) and returns the resulting signal.
+    """
+
+    def __init__(self, engine: IncrementalIndicators, weights: dict, top_n: int = None, source: dict = None):
+        self.engine = engine
+        self.columns = engine.columns
+        self.weights = dict(weights)
+        self.top_n = config.TOP_N if top_n is None else int(top_n)
+        self.params = state_params(self.weights, self.top_n, source)
+        self.cash = config.INITIAL_CASH
+        self.positions = {}
+        self.last_date = None
+        self.pv = config.INITIAL_CASH
+
+    @classmethod
+    def from_history(cls, prices: pd.DataFrame, weights: dict, start=None, top_n: int = None,
+                     source: dict = None) -> 'SignalState':
+        # indicators warm up on the rows before `start` (none when `prices`
+        # starts there, as main.py's test split does); the book is rebuilt by
+        # replaying the rows from `start` on
+        start = pd.Timestamp(start or config.TEST_START)
+        state = cls(IncrementalIndicators.from_history(prices.loc[prices.index < start]), weights, top_n, source)
+        for dt, row in prices.loc[prices.index >= start].iterrows():
+            state.step(dt, row)
+        return state
+
+    def score(self, indicators: dict) -> np.ndarray:
+        # xsec_zscore of today's row per indicator, summed in indicator order
+        out = None
+        for name, ind in indicators.items():
+            w = float(self.weights.get(name, 0.0))
+            if w == 0.0:
+                continue
+            x = ind.to_numpy(dtype=float)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                n = (~np.isnan(x)).sum()
+                mean = np.nansum(x) / n
+                sd = math.sqrt(np.nansum((x - mean) ** 2) / (n - 1)) if n > 1 else np.nan
+                z = (x - mean) / (sd if sd else np.nan) * w
+            out = z if out is None else out + z
+        return out if out is not None else np.full(len(self.columns), np.nan)
+
+    def step(self, dt, row: pd.Series) -> dict:
+        t0 = time.perf_counter()
+        dt = pd.Timestamp(dt)
+        row = pd.Series(row, dtype=float).reindex(self.columns)
+        row.name = dt
+        indicators = self.engine.update(row)
+        px = row.to_dict()
+        sell_net = 1 - config.SLIPPAGE_BPS/10000.0
+        buy_cost = 1 + config.SLIPPAGE_BPS/10000.0
+        exits, orders = [], []
+
+        def close(tkr, price, reason):
+            pos = self.positions.pop(tkr)
+            self.cash += pos['shares'] * price * sell_net
+            exits.append({'ticker': tkr, 'price': price, 'shares': pos['shares'], 'reason': reason})
+
+        for tkr, pos in list(self.positions.items()):
+            p = px.get(tkr, np.nan)
+            if np.isnan(p):
+                continue
+            pos['running_peak'] = max(pos['running_peak'], p)
+            dd_from_peak = (pos['running_peak'] - p) / pos['running_peak'] if pos['running_peak'] > 0 else 0.0
+            loss_from_entry = (pos['entry_price'] - p) / pos['entry_price'] if pos['entry_price'] > 0 else 0.0
+            if dd_from_peak >= config.TRAILING_STOP:
+                close(tkr, p, 'TRAIL_STOP')
+            elif loss_from_entry >= config.FIXED_STOP_LOSS:
+                close(tkr, p, 'STOP_LOSS')
+
+        rebalance = is_rebalance_day(dt)
+        if rebalance:
+            chosen = pick_matrix(self.score(indicators), self.top_n)
+            picks = [self.columns[j] for j in chosen if j >= 0]
+            for tkr in list(self.positions):
+                if tkr not in picks and not np.isnan(px.get(tkr, np.nan)):
+                    close(tkr, px[tkr], 'REBAL_DROP')
+            new_names = [t for t in picks if t not in self.positions]
+            alloc = self.cash / len(new_names) if new_names else 0.0
+            for tkr in new_names:
+                p = px.get(tkr, np.nan)
+                if np.isnan(p) or p <= 0:
+                    continue
+                shares = math.floor(alloc / (p * buy_cost))
+                if shares <= 0:
+                    continue
+                self.cash -= shares * p * buy_cost
+                self.positions[tkr] = {'entry_date': dt, 'entry_price': p, 'shares': shares, 'running_peak': p}
+                orders.append({'ticker': tkr, 'price': p, 'shares': shares, 'reason': 'REBAL_ADD'})
+
+        m2m = 0.0
+        for tkr, pos in self.positions.items():
+            p = px.get(tkr, np.nan)
+            if not np.isnan(p):
+                m2m += pos['shares'] * p
+        self.pv = self.cash + m2m
+        self.last_date = dt
+        latency_ms = (time.perf_counter() - t0) * 1000.0
+        return {
+            'date': str(dt.date()),
+            'rebalance': rebalance,
+            'exits': exits,
+            'orders': orders,
+            'holdings': {tkr: pos['shares'] for tkr, pos in self.positions.items()},
+            'cash': self.cash,
+            'pv': self.pv,
+            'latency_ms': latency_ms,
+            'over_budget': latency_ms > config.SERVICE_LATENCY_MS,
+        }
+
+def state_params(weights: dict, top_n: int = None, source: dict = None) -> dict:
+    # what a state was built from; a snapshot is only restored when this matches
+    return {**strategy_params(top_n), 'weights': dict(weights), 'source': source}
+
+def panel_source() -> dict:
+    # identity of the test panel main.py builds: input files, cleaning rules and split
+    from main import CLEAN_FIELDS, SPLITS
+    price_csv = config.ADJCLOSE_CSV if config.USE_ADJCLOSE else config.PRICES_CSV
+    return {
+        'prices': source_fingerprint(price_csv),
+        'ibov': source_fingerprint(config.IBOV_CSV),
+        'config': {f: getattr(config, f) for f in CLEAN_FIELDS + list(SPLITS['test'])},
+    }
+
+def load_state(snapshot=None, weights_path=None) -> SignalState:
+    """The snapshot if it was taken with the same weights, strategy and price
+    source (checked from file metadata only, so a restore reads no CSV);
+    otherwise a replay of main.py's test split, which is aligned with IBOV and
+    starts without indicator warm-up, so the signals reproduce the test
+    backtest of main.py."""
+    weights = json.loads(Path(weights_path or config.SERVICE_WEIGHTS).read_text())
+    source = panel_source()
+    snapshot = Path(snapshot or config.SERVICE_SNAPSHOT)
+    if snapshot.exists():
+        with open(snapshot, 'rb') as f:
+            state = pickle.load(f)
+        if state.params == state_params(weights, source=source):
+            return state
+    from main import load_panel, split
+    prices, ibov = load_panel(Pipeline())
+    te, _ = split(prices, ibov, 'test')
+    return SignalState.from_history(te, weights, source=source)
+
+def parse_bars(text: str) -> list:
+    # JSON lines {"date": ..., "prices": {ticker: close}} or a prices-style CSV
+    text = text.strip()
+    if not text:
+        return []
+    if text.startswith('{'):
+        bars = [json.loads(line) for line in text.splitlines() if line.strip()]
+        return [(pd.Timestamp(b['date']), pd.Series(b['prices'], dtype=float)) for b in bars]
+    df = pd.read_csv(StringIO(text), parse_dates=['Date']).sort_values('Date').set_index('Date')
+    return list(df.apply(pd.to_numeric, errors='coerce').iterrows())
+
+class SignalService:
+    """Asyncio service that turns daily bars into target holdings and exits.
+
+    Bars arrive as files dropped in `drop_dir` or as JSON lines on a TCP
+    socket, which gets the signal (or an error) back on the same connection.
+    Writers should create drop files as `*.tmp` and rename them once
+    complete: only .csv/.json/.jsonl names are picked up. Processed files
+    move to `drop_dir/processed`, files that fail to parse or apply to
+    `drop_dir/failed`. A single consumer applies bars in
+    arrival order, skipping dates at or before the last processed one, appends
+    every signal to `out_path` and snapshots the state every
+    `snapshot_every` bars and on shutdown.
+    """
+
+    def __init__(self, state: SignalState, snapshot=None, out_path=None, drop_dir=None,
+                 host: str = None, port: int = None, snapshot_every: int = None):
+        self.state = state
+        self.snapshot_path = Path(snapshot or config.SERVICE_SNAPSHOT)
+        self.out_path = Path(out_path or config.SERVICE_SIGNALS)
+        drop_dir = drop_dir or config.SERVICE_DROP_DIR
+        self.drop_dir = Path(drop_dir) if drop_dir else None
+        self.host = host or config.SERVICE_HOST
+        self.port = config.SERVICE_PORT if port is None else port
+        self.snapshot_every = int(snapshot_every or config.SERVICE_SNAPSHOT_EVERY)
+        self._queue = asyncio.Queue()
+        self._since_snapshot = 0
+
+    def snapshot(self):
+        atomic_dump(self.state, self.snapshot_path)
+        self._since_snapshot = 0
+
+    def apply(self, dt, row) -> dict:
+        if self.state.last_date is not None and pd.Timestamp(dt) <= self.state.last_date:
+            return {'date': str(pd.Timestamp(dt).date()), 'skipped': True}
+        signal = self.state.step(dt, row)
+        with open(self.out_path, 'a') as f:
+            f.write(json.dumps(signal, default=str) + '\n')
+        self._since_snapshot += 1
+        if self._since_snapshot >= self.snapshot_every:
+            self.snapshot()
+        return signal
+
+    async def submit(self, dt, row) -> dict:
+        done = asyncio.get_running_loop().create_future()
+        await self._queue.put((dt, row, done))
+        return await done
+
+    async def _consume(self):
+        while True:
+            dt, row, done = await self._queue.get()
+            try:
+                done.set_result(self.apply(dt, row))
+            except Exception as exc:
+                done.set_exception(exc)
+
+    async def _watch_drop(self):
+        processed, failed = self.drop_dir / 'processed', self.drop_dir / 'failed'
+        processed.mkdir(parents=True, exist_ok=True)
+        failed.mkdir(parents=True, exist_ok=True)
+        while True:
+            for path in sorted(p for p in self.drop_dir.iterdir() if p.is_file() and p.suffix in ('.csv', '.json', '.jsonl')):
+                target = processed
+                try:
+                    for dt, row in parse_bars(path.read_text()):
+                        await self.submit(dt, row)
+                except Exception as exc:
+                    print(f'{path.name}: {exc!r}; moved to {failed}', file=sys.stderr)
+                    target = failed
+                path.replace(target / path.name)
+            await asyncio.sleep(config.SERVICE_POLL_SECONDS)
+
+    async def _handle_client(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                try:
+                    replies = [await self.submit(dt, row) for dt, row in parse_bars(line.decode())]
+                except Exception as exc:
+                    replies = [{'error': repr(exc)}]
+                for reply in replies:
+                    writer.write((json.dumps(reply, default=str) + '\n').encode())
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def run(self):
+        tasks = [asyncio.create_task(self._consume())]
+        if self.drop_dir is not None:
+            tasks.append(asyncio.create_task(self._watch_drop()))
+        server = None
+        if self.port:
+            server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            if server is not None:
+                server.close()
+            for task in tasks:
+                task.cancel()
+            self.snapshot()
+
+def main():
+    state = load_state()
+    service = SignalService(state)
+    service.snapshot()
+    print(f'Signal service ready at {state.last_date} (PV {state.pv:,.2f})')
+    try:
+        asyncio.run(service.run())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+import shutil
+import tempfile
+import warnings
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import config, data
+import kernels
+from indicators import INDICATOR_NAMES, ZScoreTensor
+from panel import panel_dtype
+
+# data.clean_prices thresholds, shipped to shard workers
+_CLEAN_FIELDS = ['MIN_PRICE_BRL', 'MAX_ABS_DAILY_RET_FOR_TICKER', 'MAX_MISSING_RATIO', 'MIN_TRADED_DAYS_RATIO']
+
+def clean_mask(px: np.ndarray, limits: dict = None) -> np.ndarray:
+    # data.clean_prices as a keep-mask over the columns of a (dates x tickers) block;
+    # every filter is per ticker, so shards can be cleaned independently
+    limits = limits or {k: getattr(config, k) for k in _CLEAN_FIELDS}
+    quoted = ~np.isnan(px)
+    keep = (1.0 - quoted.mean(axis=0)) <= limits['MAX_MISSING_RATIO']
+    with np.errstate(invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN columns
+        keep &= np.nanmedian(px, axis=0) >= limits['MIN_PRICE_BRL']
+        keep &= quoted.mean(axis=0) >= limits['MIN_TRADED_DAYS_RATIO']
+        keep &= ~(np.abs(kernels.pct_change(px)) > limits['MAX_ABS_DAILY_RET_FOR_TICKER']).any(axis=0)
+    return keep
+
+def _clean_shard(source, cols, limits):
+    block = np.asarray(np.load(source, mmap_mode='r')[:, cols], dtype=float)
+    return np.arange(cols.start, cols.stop)[clean_mask(block, limits)]
+
+def _indicator_shard(source, cols, offset, rows, score_rows, out_dir):
+    # per-ticker work for one shard: indicators on the kept rows, written
+    # into the shared output files at the shard's column offset
+    px = np.asarray(np.load(source, mmap_mode='r')[:, cols], dtype=float)[rows]
+    stop = offset + px.shape[1]
+    prices = np.load(out_dir / 'prices.npy', mmap_mode='r+')
+    prices[:, offset:stop] = px
+    prices.flush()
+    for name, values in kernels.indicator_arrays(px).items():
+        out = np.load(out_dir / f'{name}.npy', mmap_mode='r+')
+        out[:, offset:stop] = values[score_rows]
+        out.flush()
+
+def _zscore_rows(ind: np.ndarray) -> np.ndarray:
+    # indicators.xsec_zscore for a block of dates
+    with np.errstate(invalid='ignore', divide='ignore'):
+        n = (~np.isnan(ind)).sum(axis=1, keepdims=True)
+        mean = np.nansum(ind, axis=1, keepdims=True) / n
+        var = np.nansum((ind - mean) ** 2, axis=1, keepdims=True) / (n - 1)
+        std = np.where((n > 1) & (var != 0), np.sqrt(var), np.nan)
+        return (ind - mean) / std
+
+def _map(fn, tasks, workers):
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            return list(pool.map(fn, *zip(*tasks)))
+    return [fn(*t) for t in tasks]
+
+@contextmanager
+def sharded_panel(source=None, index=None, columns=None, within=None, dates=None,
+                  shard_size: int = None, workers: int = None, directory=None):
+    """Clean, compute indicators and z-score a price panel without holding it in memory.
+
+    `source` is a (dates x tickers) .npy file, by default the raw price cache
+    from data.price_arrays. Tickers are processed in column shards of
+    `shard_size` in parallel: first the clean_prices filters, then the
+    indicators on the rows in `within` (e.g. the dates shared with the
+    benchmark). The cross-sectional z-score then runs over row blocks.
+    `dates` limits the z-scored rows, as in ZScoreTensor.
+
+    A context manager yielding the cleaned 'prices' panel and the 'tensor',
+    both backed by .npy memmaps in a fresh 'directory' under `directory`;
+    the directory is removed on exit, so use them inside the `with` block.
+    """
+    if source is None:
+        source, index, columns = data.price_arrays()
+    shard_size = int(shard_size or config.SHARD_SIZE)
+    workers = int(workers or config.SHARD_WORKERS)
+    base = Path(directory or config.SHARD_DIR)
+    base.mkdir(parents=True, exist_ok=True)
+    out_dir = Path(tempfile.mkdtemp(dir=base, prefix='panel-'))
+
+    try:
+        n_dates, n_tkrs = np.load(source, mmap_mode='r').shape
+        shards = [slice(a, min(a + shard_size, n_tkrs)) for a in range(0, n_tkrs, shard_size)]
+        limits = {k: getattr(config, k) for k in _CLEAN_FIELDS}
+        kept = _map(_clean_shard, [(source, s, limits) for s in shards], workers)
+
+        rows = np.arange(n_dates) if within is None else np.flatnonzero(index.isin(within))
+        row_index = index[rows]
+        score_index = row_index if dates is None else row_index[row_index.isin(dates)]
+        score_rows = row_index.get_indexer(score_index)
+        cols = np.concatenate(kept) if kept else np.empty(0, dtype=np.intp)
+        dtype = panel_dtype()
+        np.lib.format.open_memmap(out_dir / 'prices.npy', mode='w+', dtype=dtype, shape=(len(rows), len(cols)))
+        for name in INDICATOR_NAMES:
+            np.lib.format.open_memmap(out_dir / f'{name}.npy', mode='w+', dtype=dtype, shape=(len(score_rows), len(cols)))
+        offsets = np.cumsum([0] + [len(k) for k in kept])
+        _map(_indicator_shard, [(source, k, int(o), rows, score_rows, out_dir)
+                                for k, o in zip(kept, offsets) if len(k)], workers)
+
+        values = np.lib.format.open_memmap(out_dir / 'zscores.npy', mode='w+', dtype=dtype,
+                                           shape=(len(INDICATOR_NAMES), len(score_rows), len(cols)))
+        empty = np.lib.format.open_memmap(out_dir / 'empty.npy', mode='w+', dtype=dtype, shape=(len(score_rows), len(cols)))
+        step = max(1, int(config.SHARD_ROW_BLOCK))
+        for k, name in enumerate(INDICATOR_NAMES):
+            ind = np.load(out_dir / f'{name}.npy', mmap_mode='r')
+            for r in range(0, len(score_rows), step):
+                block = np.asarray(ind[r:r + step], dtype=float)
+                values[k, r:r + step] = _zscore_rows(block)
+                if k == 0:
+                    empty[r:r + step] = block * 0.0
+        values.flush(); empty.flush()
+
+        tickers = columns[cols]
+        prices = pd.DataFrame(np.load(out_dir / 'prices.npy', mmap_mode='r'), index=row_index, columns=tickers, copy=False)
+        tensor = ZScoreTensor.from_arrays(INDICATOR_NAMES, score_index, tickers,
+                                          np.load(out_dir / 'zscores.npy', mmap_mode='r'),
+                                          np.load(out_dir / 'empty.npy', mmap_mode='r'))
+        yield {'prices': prices, 'tensor': tensor, 'directory': out_dir}
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
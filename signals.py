@@ -1,5 +1,8 @@
 import pandas as pd
 import numpy as np
+import config
+import kernels
+from indicators import ZScoreTensor
 
 INDICATOR_NAMES = [
     'mom_12_1',
@@ -22,6 +25,8 @@ def _rsi(series: pd.Series, n: int = 14) -> pd.Series:
     return rsi
 
 def compute_indicators(prices: pd.DataFrame) -> dict:
+    if config.INDICATOR_ENGINE == 'numpy':
+        return kernels.compute_indicators(prices)
     roll252 = prices.rolling(252, min_periods=84)
     roll126 = prices.rolling(126, min_periods=42)
     roll100 = prices.rolling(100, min_periods=34)
@@ -52,7 +57,9 @@ def _xzs(df: pd.DataFrame) -> pd.DataFrame:
     std = df.std(axis=1, skipna=True).replace(0, np.nan)
     return (df.sub(mean, axis=0)).div(std, axis=0)
 
-def score_from_weights(indicators: dict, weights: dict) -> pd.DataFrame:
+def score_from_weights(indicators, weights: dict) -> pd.DataFrame:
+    if isinstance(indicators, ZScoreTensor):
+        return indicators.score(weights)
     parts = []
     for name, df in indicators.items():
         w = float(weights.get(name, 0.0))
@@ -0,0 +1,69 @@
+import itertools
+import json
+import numpy as np
+import pandas as pd
+import config
+from indicators import INDICATOR_NAMES, ZScoreTensor
+from backtest import monthly_rebalance_dates, pick_matrix, simulate_batch
+from utils import stats_frame
+
+SWEEP_KEYS = ['TOP_N', 'FIXED_STOP_LOSS', 'TRAILING_STOP', 'REB_FREQ']
+
+def parameter_grid(grid: dict = None) -> pd.DataFrame:
+    # one row per combination; keys missing from `grid` keep their config value
+    grid = config.SWEEP_GRID if grid is None else grid
+    unknown = set(grid) - set(SWEEP_KEYS)
+    if unknown:
+        raise ValueError(f'Cannot sweep {sorted(unknown)}; supported: {SWEEP_KEYS}')
+    values = [list(grid.get(k, [getattr(config, k)])) for k in SWEEP_KEYS]
+    return pd.DataFrame(list(itertools.product(*values)), columns=SWEEP_KEYS)
+
+def run_sweep(prices: pd.DataFrame, weights: dict, grid: dict = None, tensor: ZScoreTensor = None) -> pd.DataFrame:
+    """Backtest every parameter combination for one weight vector in a single pass.
+
+    Scores are contracted and ranked once per rebalance date (the union of
+    all REB_FREQ calendars); each TOP_N takes a prefix of that ranking, and
+    all combinations run lockstep through simulate_batch with their own stop
+    levels and rebalance calendar. Returns the grid with one stats row each.
+    """
+    combos = parameter_grid(grid)
+    calendars = {f: monthly_rebalance_dates(prices.index, f) for f in combos['REB_FREQ'].unique()}
+    dates = pd.DatetimeIndex(sorted(set().union(*calendars.values())))
+    reb_rows = prices.index.get_indexer(dates)
+
+    if tensor is None:
+        tensor = ZScoreTensor.from_prices(prices, dates=dates)
+    rows = tensor.index.get_indexer(dates)
+    if (rows < 0).any():
+        raise ValueError('tensor does not cover every rebalance date')
+    scores = tensor.contract(tensor.weight_vector(weights), rows=rows)
+    top = combos['TOP_N'].to_numpy(dtype=int)
+    ranked = pick_matrix(scores, int(top.max()))
+
+    cut = np.arange(ranked.shape[1])[None, None, :] >= top[:, None, None]
+    picks = np.where(cut, -1, ranked[None])
+    active = np.stack([dates.isin(calendars[f]) for f in combos['REB_FREQ']])
+
+    pv, n_trades = simulate_batch(prices.to_numpy(dtype=float), picks, reb_rows,
+                                  trailing_stop=combos['TRAILING_STOP'].to_numpy(dtype=float),
+                                  stop_loss=combos['FIXED_STOP_LOSS'].to_numpy(dtype=float),
+                                  active=active, count_trades=True)
+    return pd.concat([combos, stats_frame(pv, n_trades)], axis=1)
+
+def main(weights_path=None):
+    # the pipeline's aligned training split, so the sweep sees the GA's dates
+    from main import load_panel, split
+    from pipeline import Pipeline
+    out = config.OUT_DIR
+    pipe = Pipeline()
+    prices, _ = split(*load_panel(pipe), 'train')
+    path = out / 'chosen_weights.json' if weights_path is None else weights_path
+    weights = json.loads(path.read_text()) if path.exists() else {k: 1.0 for k in INDICATOR_NAMES}
+    table = run_sweep(prices, weights)
+    table.to_csv(out / 'sweep_stats.csv', index=False)
+    print(table.sort_values('Sharpe(0%)', ascending=False).head(10).to_string(index=False))
+    print('Done. Outputs in:', out)
+    return pipe
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 import pandas as pd
 import numpy as np
+import kernels
 
 def cagr(pv: pd.Series) -> float:
     if pv is None or pv.empty or pv.iloc[0] <= 0:
@@ -33,13 +34,80 @@ def max_drawdown(pv: pd.Series) -> float:
 def drawdown_series(pv: pd.Series) -> pd.Series:
     return pv / pv.cummax() - 1.0
 
-def stats_from_pv(pv: pd.Series, trades: int) -> dict:
-    rets = pv.pct_change().dropna()
+STAT_NAMES = ['CAGR', 'Ann.Vol', 'Sharpe(0%)', 'Sortino(0%)', 'MaxDD']
+
+def _returns(pv: np.ndarray) -> np.ndarray:
+    # pv.pct_change() per row; dropped entries come back as NaN
+    base = kernels.ffill(pv.T).T if kernels.PCT_CHANGE_PADS else pv
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return base[:, 1:] / base[:, :-1] - 1.0
+
+def _nanstd(x: np.ndarray, n: np.ndarray) -> np.ndarray:
+    # row std (ddof=1) over the non-NaN entries, NaN below two of them
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.nansum(x, axis=1) / n
+        var = np.nansum((x - mean[:, None]) ** 2, axis=1) / (n - 1)
+    return np.where(n > 1, np.sqrt(np.where(n > 1, var, 0.0)), np.nan)
+
+def pv_cagr(pv: np.ndarray) -> np.ndarray:
+    pv = np.atleast_2d(np.asarray(pv, dtype=float))
+    if not pv.shape[1]:
+        return np.full(len(pv), np.nan)
+    with np.errstate(invalid='ignore'):
+        out = (pv[:, -1] / pv[:, 0]) ** (252/pv.shape[1]) - 1.0
+    return np.where(pv[:, 0] <= 0, np.nan, out)
+
+def pv_stats(pv: np.ndarray) -> dict:
+    """cagr, ann_vol, sharpe, sortino and max_drawdown for every row of a
+    (strategies x dates) PV matrix in one pass, with the same NaN handling as
+    the Series versions. Returns {stat name: array over strategies}."""
+    pv = np.atleast_2d(np.asarray(pv, dtype=float))
+    rets = _returns(pv) if pv.shape[1] else pv
+    valid = ~np.isnan(rets)
+    n = valid.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.nansum(rets, axis=1) / n
+        sd = _nanstd(rets, n)
+        neg = np.where(rets < 0, rets, np.nan)
+        dsd = _nanstd(neg, (rets < 0).sum(axis=1))
+        dd = pv / np.fmax.accumulate(pv, axis=1) - 1.0
+    has_dd = (~np.isnan(dd)).any(axis=1)
     return {
-        'CAGR': cagr(pv),
-        'Ann.Vol': ann_vol(rets),
-        'Sharpe(0%)': sharpe(rets),
-        'Sortino(0%)': sortino(rets),
-        'MaxDD': max_drawdown(pv),
-        'NumTrades': trades
-    }
\ No newline at end of file
+        'CAGR': pv_cagr(pv),
+        'Ann.Vol': sd * np.sqrt(252),
+        'Sharpe(0%)': np.where(sd == 0, np.nan, mean / sd * np.sqrt(252)),
+        'Sortino(0%)': np.where((dsd == 0) | np.isnan(dsd), np.nan, mean / dsd * np.sqrt(252)),
+        'MaxDD': np.where(has_dd, np.where(np.isnan(dd), np.inf, dd).min(axis=1, initial=np.inf), np.nan),
+    }
+
+def drawdown_matrix(pv: np.ndarray) -> np.ndarray:
+    pv = np.atleast_2d(np.asarray(pv, dtype=float))
+    return pv / np.fmax.accumulate(pv, axis=1) - 1.0
+
+def rolling_drawdown(pv: np.ndarray, window: int, min_periods: int = 1) -> np.ndarray:
+    # drawdown from the peak of the trailing `window` dates
+    pv = np.atleast_2d(np.asarray(pv, dtype=float))
+    return pv / kernels.rolling_max(pv.T, window, min_periods).T - 1.0
+
+def rolling_sharpe(pv: np.ndarray, window: int, min_periods: int = None) -> np.ndarray:
+    # rets.rolling(window).mean() / rets.rolling(window).std() * sqrt(252) per
+    # row, aligned with the PV dates (the first date has no return)
+    pv = np.atleast_2d(np.asarray(pv, dtype=float))
+    min_periods = window if min_periods is None else min_periods
+    rets = np.hstack([np.full((len(pv), 1), np.nan), _returns(pv)]).T
+    mean = kernels.rolling_mean(rets, window, min_periods)
+    sd = kernels.rolling_std(rets, window, min_periods)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(sd == 0, np.nan, mean / sd * np.sqrt(252)).T
+
+def stats_frame(pv: np.ndarray, trades=None, index=None) -> pd.DataFrame:
+    # pv_stats as one row per strategy, plus NumTrades when given
+    table = pd.DataFrame(pv_stats(pv), index=index)
+    if trades is not None:
+        table['NumTrades'] = np.asarray(trades)
+    return table
+
+def stats_from_pv(pv: pd.Series, trades: int) -> dict:
+    stats = {k: float(v[0]) for k, v in pv_stats(pv.to_numpy(dtype=float)).items()}
+    stats['NumTrades'] = trades
+    return stats
\ No newline at end of file
@@ -0,0 +1,116 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import config, data
+from indicators import ZScoreTensor, score_from_weights
+from genetic_algorithm import optimize_weights
+from backtest import run_backtest, monthly_rebalance_dates
+from parallel import worker_config
+from utils import stats_from_pv
+
+def walk_forward_windows(index: pd.DatetimeIndex, start=None, end=None, train_years=None,
+                         test_years=None, step_years=None) -> list:
+    start = pd.Timestamp(start or config.WF_START)
+    end = pd.Timestamp(end or config.WF_END)
+    train = pd.DateOffset(years=train_years or config.WF_TRAIN_YEARS)
+    test = pd.DateOffset(years=test_years or config.WF_TEST_YEARS)
+    step = pd.DateOffset(years=step_years or config.WF_STEP_YEARS)
+    one_day = pd.Timedelta(days=1)
+
+    windows = []
+    s = start
+    while s + train <= end:
+        t0 = s + train
+        w = {
+            'train_start': s,
+            'train_end': t0 - one_day,
+            'test_start': t0,
+            'test_end': min(t0 + test - one_day, end),
+        }
+        if len(index[(index >= w['test_start']) & (index <= w['test_end'])]) >= 2:
+            windows.append(w)
+        s = s + step
+    return windows
+
+def _run_window(window: dict, px_tr, px_te, z_tr, z_te, cfg: dict) -> dict:
+    for key, value in cfg.items():
+        setattr(config, key, value)
+    best_w, best_fit = optimize_weights(
+        px_tr,
+        top_n=config.TOP_N,
+        seed=config.GA_SEED,
+        pop_size=config.GA_POP_SIZE,
+        generations=config.GA_GENERATIONS,
+        crossover_rate=config.GA_CROSSOVER_RATE,
+        mutation_rate=config.GA_MUTATION_RATE,
+        elitism=config.GA_ELITISM,
+        tensor=z_tr
+    )
+    res = run_backtest(px_te, score_from_weights(z_te, best_w), config.TOP_N)
+    return {'window': window, 'weights': best_w, 'train_fitness': best_fit, 'pv': res['pv'], 'trades': res['trades']}
+
+def run_walk_forward(prices: pd.DataFrame, windows: list = None, workers: int = None) -> dict:
+    """Re-fit the GA on each train window and trade the following test window.
+
+    Indicators are computed once on the full panel, z-scored on rebalance
+    dates only, and every window uses a row slice of the same tensor, so overlapping windows share that
+    work and each window starts with warmed-up rolling indicators (all of
+    them look backwards only). The out-of-sample PV segments are
+    chain-linked into one curve that starts at INITIAL_CASH.
+    """
+    windows = walk_forward_windows(prices.index) if windows is None else windows
+    workers = config.WF_WORKERS if workers is None else workers
+    tensor = ZScoreTensor.from_prices(prices, dates=monthly_rebalance_dates(prices.index, config.REB_FREQ))
+    cfg = worker_config()
+
+    tasks = []
+    for w in windows:
+        tasks.append((
+            w,
+            prices.loc[w['train_start']:w['train_end']],
+            prices.loc[w['test_start']:w['test_end']],
+            tensor.slice(w['train_start'], w['train_end']),
+            tensor.slice(w['test_start'], w['test_end']),
+        ))
+
+    if workers > 1:
+        # windows already use every worker; keep each window's GA serial
+        cfg['GA_EXECUTOR'] = 'serial'
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_run_window, *zip(*tasks), [cfg] * len(tasks)))
+    else:
+        results = [_run_window(*t, cfg) for t in tasks]
+
+    level = config.INITIAL_CASH
+    segments, rows, trades = [], [], []
+    for k, r in enumerate(results):
+        seg = r['pv'] / config.INITIAL_CASH * level
+        level = seg.iloc[-1]
+        segments.append(seg)
+        rows.append({**r['window'], 'train_fitness': r['train_fitness'],
+                     'test_return': r['pv'].iloc[-1] / r['pv'].iloc[0] - 1.0, **r['weights']})
+        if not r['trades'].empty:
+            trades.append(r['trades'].assign(window=k))
+
+    return {
+        'pv': pd.concat(segments) if segments else pd.Series(dtype=float),
+        'windows': pd.DataFrame(rows),
+        'trades': pd.concat(trades, ignore_index=True) if trades else pd.DataFrame(),
+    }
+
+def main():
+    out = config.OUT_DIR
+    prices = data.clean_prices(data.load_prices())
+    prices, ibov = data.align_with_benchmark(prices, data.load_ibov())
+    prices = prices.loc[config.WF_START:config.WF_END]
+
+    res = run_walk_forward(prices)
+    res['pv'].to_csv(out / 'pv_walkforward.csv')
+    res['windows'].to_csv(out / 'windows_walkforward.csv', index=False)
+    res['trades'].to_csv(out / 'trades_walkforward.csv', index=False)
+    pd.Series(stats_from_pv(res['pv'], len(res['trades']))).to_csv(out / 'stats_walkforward.csv', header=False)
+    print(json.dumps({str(w['test_start'].date()): w['train_fitness'] for _, w in res['windows'].iterrows()}, indent=2))
+    print('Done. Outputs in:', out)
+
+if __name__ == '__main__':
+    main()